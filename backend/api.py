@@ -1,32 +1,36 @@
 from sqlalchemy.orm import Session
 
-from fastapi import Depends, HTTPException, APIRouter, Query
-from database import SessionLocal
-import models, schemas
+from fastapi import Depends, HTTPException, APIRouter, Query, Request
+from fastapi.concurrency import run_in_threadpool
+from shards import SessionLocal
+from coalesce import CoalescingRoute
+import models, schemas, stock, jobs, orders, forecasting, tabular, shards, retention
 from typing import List, Optional
-from datetime import date
+from datetime import date, datetime
 from passlib.context import CryptContext
-import json
-import google.generativeai as genai
-from datetime import datetime, timedelta
 
-router = APIRouter(prefix="/api/v1")
+# Identical concurrent GETs share one query and one encoded response
+router = APIRouter(prefix="/api/v1", route_class=CoalescingRoute)
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
-# Configure Google Gemini API
-GEMINI_API_KEY = ""
-genai.configure(api_key=GEMINI_API_KEY)
-
 # In-memory subscription storage: { userId: [retailerId1, retailerId2, ...] }
 subscribed_retailers: dict = {}
 
 def get_db():
+    # RoutedSession: the catalog session, which also routes to per-retailer shards
     db = SessionLocal()
     try:
         yield db
     finally:
         db.close()
 
+def _shard_for_id(db: Session, row_id: int, detail: str) -> Session:
+    # Ids come from the client: one pointing at a shard that does not exist is a 404
+    try:
+        return db.for_id(row_id)
+    except shards.ShardNotFound:
+        raise HTTPException(status_code=404, detail=detail)
+
 # Auth endpoints
 @router.post("/auth/signup", response_model=schemas.User)
 def signup(user: schemas.UserCreate, db: Session = Depends(get_db)):
@@ -62,10 +66,11 @@ def get_retailers(db: Session = Depends(get_db)):
 @router.get("/product-batch-discounted-price/")
 def get_product_batch_discounted_price(product_batch_id: int, db: Session = Depends(get_db)):
     today = date.today()
-    price_obj = db.query(models.ProductPrice).filter(models.ProductPrice.product_batch_id == product_batch_id, models.ProductPrice.date == today).first()
+    shard = _shard_for_id(db, product_batch_id, "Batch not found")
+    price_obj = shard.query(models.ProductPrice).filter(models.ProductPrice.product_batch_id == product_batch_id, models.ProductPrice.date == today).first()
     if price_obj:
         return {"discounted_price": price_obj.discounted_price}
-    batch = db.query(models.ProductBatch).filter(models.ProductBatch.id == product_batch_id).first()
+    batch = shard.query(models.ProductBatch).filter(models.ProductBatch.id == product_batch_id).first()
     if batch:
         return {"discounted_price": batch.base_price}
     raise HTTPException(status_code=404, detail="Batch not found")
@@ -73,7 +78,14 @@ def get_product_batch_discounted_price(product_batch_id: int, db: Session = Depe
 # Products
 @router.post("/products/", response_model=schemas.Product)
 def create_product(product: schemas.ProductCreate, db: Session = Depends(get_db)):
-    db_product = models.Product(name=product.name, category=product.category)
+    if product.retailer_id is not None:
+        # The owner picks the product's shard, so it must be a real retailer with a usable id range
+        retailer = db.query(models.User).filter(models.User.id == product.retailer_id).first()
+        if not retailer or retailer.role != "RETAILER":
+            raise HTTPException(status_code=400, detail="retailer_id must refer to a RETAILER user")
+        if product.retailer_id > shards.MAX_RETAILER_ID:
+            raise HTTPException(status_code=400, detail=f"retailer_id must be at most {shards.MAX_RETAILER_ID}")
+    db_product = models.Product(name=product.name, category=product.category, retailer_id=product.retailer_id)
     db.add(db_product)
     db.commit()
     db.refresh(db_product)
@@ -82,8 +94,10 @@ def create_product(product: schemas.ProductCreate, db: Session = Depends(get_db)
 
 # List products
 @router.get("/products/", response_model=List[schemas.Product])
-def read_products(name: Optional[str] = Query(None), category: Optional[str] = Query(None), db: Session = Depends(get_db)):
+def read_products(name: Optional[str] = Query(None), category: Optional[str] = Query(None), retailer_id: Optional[int] = Query(None), db: Session = Depends(get_db)):
     query = db.query(models.Product)
+    if retailer_id:
+        query = query.filter(models.Product.retailer_id == retailer_id)
     if name:
         query = query.filter(models.Product.name.ilike(f"%{name}%"))
     if category:
@@ -101,7 +115,7 @@ def get_product(id: int, db: Session = Depends(get_db)):
 # Get cheapest batch for product
 @router.get("/products/{id}/cheapest-batch", response_model=schemas.ProductBatch)
 def get_cheapest_batch(id: int, db: Session = Depends(get_db)):
-    batch = db.query(models.ProductBatch).filter(models.ProductBatch.product_id == id).order_by(models.ProductBatch.base_price.asc()).first()
+    batch = db.for_product(id).query(models.ProductBatch).filter(models.ProductBatch.product_id == id).order_by(models.ProductBatch.base_price.asc()).first()
     if not batch:
         raise HTTPException(status_code=404, detail="No batch found for product")
     return batch
@@ -110,25 +124,33 @@ def get_cheapest_batch(id: int, db: Session = Depends(get_db)):
 # Product Batches
 @router.post("/product-batches/", response_model=schemas.ProductBatch)
 def create_product_batch(batch: schemas.ProductBatchCreate, db: Session = Depends(get_db)):
+    shard = db.for_product(batch.product_id)
     db_batch = models.ProductBatch(**batch.dict())
-    db.add(db_batch)
-    db.commit()
-    db.refresh(db_batch)
+    shard.add(db_batch)
+    shard.flush()
+    stock.receive_batch(shard, db_batch)
+    shard.commit()
+    shard.refresh(db_batch)
     return db_batch
 
 
 # List product batches
-@router.get("/product-batches/", response_model=List[schemas.ProductBatch])
-def read_product_batches(product_id: Optional[int] = Query(None), db: Session = Depends(get_db)):
-    query = db.query(models.ProductBatch)
-    if product_id:
-        query = query.filter(models.ProductBatch.product_id == product_id)
-    return query.all()
+# Large lists honour `fields=` and the Accept header (row JSON, column JSON or MessagePack, see tabular.py)
+@router.get("/product-batches/", response_model=List[schemas.ProductBatch], responses=tabular.RESPONSES)
+def read_product_batches(request: Request, product_id: Optional[int] = Query(None), fields: Optional[str] = Query(None), db: Session = Depends(get_db)):
+    media_type = tabular.negotiate(request)
+    columns = tabular.select_columns(models.ProductBatch, schemas.ProductBatch, fields)
+    def query_shard(shard: Session):
+        query = shard.query(*columns)
+        if product_id:
+            query = query.filter(models.ProductBatch.product_id == product_id)
+        return query.all()
+    return tabular.respond(media_type, columns, db.fan_out(query_shard, product_id))
 
 # Get product batch by id
 @router.get("/product-batches/{id}", response_model=schemas.ProductBatch)
 def get_product_batch(id: int, db: Session = Depends(get_db)):
-    batch = db.query(models.ProductBatch).filter(models.ProductBatch.id == id).first()
+    batch = _shard_for_id(db, id, "Product batch not found").query(models.ProductBatch).filter(models.ProductBatch.id == id).first()
     if not batch:
         raise HTTPException(status_code=404, detail="Product batch not found")
     return batch
@@ -136,119 +158,186 @@ def get_product_batch(id: int, db: Session = Depends(get_db)):
 # Product Prices (by batch)
 @router.post("/product-prices/", response_model=schemas.ProductPrice)
 def create_product_price(price: schemas.ProductPriceCreate, db: Session = Depends(get_db)):
+    shard = _shard_for_id(db, price.product_batch_id, "Product batch not found")
     db_price = models.ProductPrice(**price.dict())
-    db.add(db_price)
-    db.commit()
-    db.refresh(db_price)
+    shard.add(db_price)
+    shard.commit()
+    shard.refresh(db_price)
     return db_price
 
-@router.get("/product-prices/", response_model=List[schemas.ProductPrice])
-def read_product_prices(product_batch_id: Optional[int] = Query(None), date_from: Optional[date] = Query(None), date_to: Optional[date] = Query(None), db: Session = Depends(get_db)):
-    query = db.query(models.ProductPrice)
+@router.get("/product-prices/", response_model=List[schemas.ProductPrice], responses=tabular.RESPONSES)
+def read_product_prices(request: Request, product_batch_id: Optional[int] = Query(None), date_from: Optional[date] = Query(None), date_to: Optional[date] = Query(None), fields: Optional[str] = Query(None), db: Session = Depends(get_db)):
+    media_type = tabular.negotiate(request)
+    columns = tabular.select_columns(models.ProductPrice, schemas.ProductPrice, fields)
+    def query_shard(shard: Session):
+        query = shard.query(*columns)
+        if product_batch_id:
+            query = query.filter(models.ProductPrice.product_batch_id == product_batch_id)
+        if date_from:
+            query = query.filter(models.ProductPrice.date >= date_from)
+        if date_to:
+            query = query.filter(models.ProductPrice.date <= date_to)
+        return query.all()
     if product_batch_id:
-        query = query.filter(models.ProductPrice.product_batch_id == product_batch_id)
-    if date_from:
-        query = query.filter(models.ProductPrice.date >= date_from)
-    if date_to:
-        query = query.filter(models.ProductPrice.date <= date_to)
-    return query.all()
+        try:
+            shard = db.for_id(product_batch_id)
+        except shards.ShardNotFound:
+            return tabular.respond(media_type, columns, [])
+        return tabular.respond(media_type, columns, query_shard(shard))
+    return tabular.respond(media_type, columns, db.fan_out(query_shard))
 
 
 # Inventory endpoints
 @router.post("/inventories/", response_model=schemas.Inventory)
 def create_inventory(inv: schemas.InventoryCreate, db: Session = Depends(get_db)):
+    shard = db.for_product(inv.product_id)
     db_inv = models.Inventory(**inv.dict())
-    db.add(db_inv)
-    db.commit()
-    db.refresh(db_inv)
+    shard.add(db_inv)
+    shard.commit()
+    shard.refresh(db_inv)
     return db_inv
 
-@router.get("/inventories/", response_model=List[schemas.Inventory])
-def read_inventories(product_id: Optional[int] = Query(None), date_from: Optional[date] = Query(None), date_to: Optional[date] = Query(None), db: Session = Depends(get_db)):
-    query = db.query(models.Inventory)
-    if product_id:
-        query = query.filter(models.Inventory.product_id == product_id)
-    if date_from:
-        query = query.filter(models.Inventory.date >= date_from)
-    if date_to:
-        query = query.filter(models.Inventory.date <= date_to)
-    return query.all()
+@router.get("/inventories/", response_model=List[schemas.Inventory], responses=tabular.RESPONSES)
+def read_inventories(request: Request, product_id: Optional[int] = Query(None), date_from: Optional[date] = Query(None), date_to: Optional[date] = Query(None), fields: Optional[str] = Query(None), db: Session = Depends(get_db)):
+    media_type = tabular.negotiate(request)
+    columns = tabular.select_columns(models.Inventory, schemas.Inventory, fields)
+    def query_shard(shard: Session):
+        query = shard.query(*columns)
+        if product_id:
+            query = query.filter(models.Inventory.product_id == product_id)
+        if date_from:
+            query = query.filter(models.Inventory.date >= date_from)
+        if date_to:
+            query = query.filter(models.Inventory.date <= date_to)
+        return query.all()
+    return tabular.respond(media_type, columns, db.fan_out(query_shard, product_id))
+
+
+# Stock endpoints (running balances from the stock ledger)
+@router.get("/stock/", response_model=List[schemas.ProductStock])
+def read_stock(db: Session = Depends(get_db)):
+    return db.fan_out(lambda shard: shard.query(models.ProductStock).all())
+
+@router.get("/stock/batches/", response_model=List[schemas.BatchStock])
+def read_batch_stock(product_id: Optional[int] = Query(None), db: Session = Depends(get_db)):
+    def query_shard(shard: Session):
+        query = shard.query(models.BatchStock)
+        if product_id:
+            query = query.filter(models.BatchStock.product_id == product_id)
+        return query.all()
+    return db.fan_out(query_shard, product_id)
+
+@router.get("/stock/{product_id}", response_model=schemas.ProductStock)
+def get_stock(product_id: int, db: Session = Depends(get_db)):
+    return {"product_id": product_id, "quantity": stock.current_stock(db.for_product(product_id), product_id)}
+
+
+# Rollup endpoints (daily history of archived prices and sales)
+@router.get("/rollups/prices/", response_model=List[schemas.PriceRollup])
+def read_price_rollups(product_id: Optional[int] = Query(None), date_from: Optional[date] = Query(None), date_to: Optional[date] = Query(None), db: Session = Depends(get_db)):
+    def query_shard(shard: Session):
+        query = shard.query(models.PriceRollup)
+        if product_id:
+            query = query.filter(models.PriceRollup.product_id == product_id)
+        if date_from:
+            query = query.filter(models.PriceRollup.date >= date_from)
+        if date_to:
+            query = query.filter(models.PriceRollup.date <= date_to)
+        return query.all()
+    return sorted(db.fan_out(query_shard, product_id), key=lambda r: r.date)
+
+@router.get("/rollups/sales/", response_model=List[schemas.SalesRollup])
+def read_sales_rollups(product_id: Optional[int] = Query(None), date_from: Optional[date] = Query(None), date_to: Optional[date] = Query(None), db: Session = Depends(get_db)):
+    def query_shard(shard: Session):
+        query = shard.query(models.SalesRollup)
+        if product_id:
+            query = query.filter(models.SalesRollup.product_id == product_id)
+        if date_from:
+            query = query.filter(models.SalesRollup.date >= date_from)
+        if date_to:
+            query = query.filter(models.SalesRollup.date <= date_to)
+        return query.all()
+    return sorted(db.fan_out(query_shard, product_id), key=lambda r: r.date)
 
 
 # Order endpoints
+def _place_order_now(db: Session, order: schemas.OrderCreate) -> List[int]:
+    db_orders = orders.place_routed_order(db, order)
+    db.commit_all()
+    return [o.id for o in db_orders]
+
+def _link_carts(db_orders: list):
+    # Orders split from one cart share a cart_id; each lists the others and the cart total
+    carts = {}
+    for order in db_orders:
+        if order.cart_id:
+            carts.setdefault(order.cart_id, []).append(order)
+    for cart in carts.values():
+        for order in cart:
+            order.related_order_ids = [other.id for other in cart if other is not order]
+            order.cart_total_price = round(sum(other.total_price for other in cart), 2)
+
+def _load_order(db: Session, order_ids: List[int]):
+    db_orders = []
+    for order_id in order_ids:
+        shard = db.for_id(order_id)
+        db_order = shard.query(models.Order).filter(models.Order.id == order_id).first()
+        db_order.items = shard.query(models.OrderItem).filter_by(order_id=db_order.id).all()
+        db_orders.append(db_order)
+    # Carts spanning several retailers are split into one order per retailer shard
+    _link_carts(db_orders)
+    return db_orders[0]
+
 @router.post("/orders/", response_model=schemas.Order)
-def create_order(order: schemas.OrderCreate, db: Session = Depends(get_db)):
-    # Create the order
-    db_order = models.Order(date=order.date, total_price=order.total_price)
-    db.add(db_order)
-    db.commit()
-    db.refresh(db_order)
-    
-    # Add order items and deduct from inventory
-    for item in order.items:
-        # Create order item
-        db_item = models.OrderItem(
-            order_id=db_order.id, 
-            product_id=item.product_id, 
-            quantity=item.quantity, 
-            price=item.price
-        )
-        db.add(db_item)
-        
-        # Deduct from ProductBatch (find the batch with lowest price and deduct quantity)
-        batches = db.query(models.ProductBatch).filter(
-            models.ProductBatch.product_id == item.product_id
-        ).order_by(models.ProductBatch.base_price.asc()).all()
-        
-        remaining_quantity = item.quantity
-        for batch in batches:
-            if remaining_quantity <= 0:
-                break
-            if batch.quantity > 0:
-                deduct_amount = min(remaining_quantity, batch.quantity)
-                batch.quantity -= deduct_amount
-                remaining_quantity -= deduct_amount
-        
-        # Update or create Inventory record for today
-        today = date.today()
-        inventory = db.query(models.Inventory).filter(
-            models.Inventory.product_id == item.product_id,
-            models.Inventory.date == today
-        ).first()
-        
-        if inventory:
-            # Deduct from existing inventory
-            inventory.quantity = max(0, inventory.quantity - item.quantity)
-        else:
-            # Get previous inventory or default to 0
-            prev_inventory = db.query(models.Inventory).filter(
-                models.Inventory.product_id == item.product_id
-            ).order_by(models.Inventory.date.desc()).first()
-            
-            previous_qty = prev_inventory.quantity if prev_inventory else 0
-            new_inventory = models.Inventory(
-                product_id=item.product_id,
-                date=today,
-                quantity=max(0, previous_qty - item.quantity)
-            )
-            db.add(new_inventory)
-    
-    db.commit()
-    db.refresh(db_order)
-    db_order.items = db.query(models.OrderItem).filter_by(order_id=db_order.id).all()
-    return db_order
+async def create_order(order: schemas.OrderCreate, db: Session = Depends(get_db)):
+    if orders.order_queue:
+        # Group commit: wait for the writer task to commit this order with others
+        order_ids = await orders.order_queue.submit(order)
+    else:
+        order_ids = await run_in_threadpool(_place_order_now, db, order)
+    return await run_in_threadpool(_load_order, db, order_ids)
 
 @router.get("/orders/", response_model=List[schemas.Order])
 def read_orders(date_from: Optional[date] = Query(None), date_to: Optional[date] = Query(None), db: Session = Depends(get_db)):
-    query = db.query(models.Order)
-    if date_from:
-        query = query.filter(models.Order.date >= date_from)
-    if date_to:
-        query = query.filter(models.Order.date <= date_to)
-    orders = query.all()
-    for order in orders:
-        order.items = db.query(models.OrderItem).filter_by(order_id=order.id).all()
-    return orders
+    def query_shard(shard: Session):
+        query = shard.query(models.Order)
+        if date_from:
+            query = query.filter(models.Order.date >= date_from)
+        if date_to:
+            query = query.filter(models.Order.date <= date_to)
+        db_orders = query.all()
+        for order in db_orders:
+            order.items = shard.query(models.OrderItem).filter_by(order_id=order.id).all()
+        return db_orders
+    db_orders = db.fan_out(query_shard)
+    _link_carts(db_orders)
+    return db_orders
+
+# Job endpoints (scheduled repricing / end-of-day runs)
+@router.get("/jobs/", response_model=List[schemas.JobRun])
+def read_job_runs(name: Optional[str] = Query(None), db: Session = Depends(get_db)):
+    def query_shard(shard: Session):
+        query = shard.query(models.JobRun)
+        if name:
+            query = query.filter(models.JobRun.name == name)
+        return query.all()
+    return sorted(db.fan_out(query_shard), key=lambda r: r.started_at or datetime.min, reverse=True)
+
+# Runs the job on every shard, or only on `retailer_id`'s shard when given
+@router.post("/jobs/{name}/run", response_model=List[schemas.JobRun])
+def trigger_job(name: str, run_date: Optional[date] = Query(None), retailer_id: Optional[int] = Query(None)):
+    if name not in jobs.JOBS:
+        raise HTTPException(status_code=404, detail="Job not found")
+    if name == "retention" and not retention.RETENTION_ENABLED:
+        # Retention deletes live rows; over HTTP only when it is switched on
+        raise HTTPException(status_code=403, detail="Retention is disabled (SHELFSMART_RETENTION=1); run `python retention.py` instead")
+    run_date = run_date or date.today()
+    if retailer_id is not None:
+        try:
+            return [jobs.run_job(name, run_date, retailer_id)]
+        except shards.ShardNotFound:
+            raise HTTPException(status_code=404, detail="Shard not found")
+    return list(jobs.run_job_all_shards(name, run_date).values())
 
 # Subscription endpoints (in-memory storage)
 @router.post("/subscriptions/{user_id}/{retailer_id}")
@@ -278,112 +367,16 @@ def get_subscribed_users(retailer_id: int):
     subscribed_users = [uid for uid, retailer_ids in subscribed_retailers.items() if retailer_id in retailer_ids]
     return {"retailer_id": retailer_id, "user_ids": subscribed_users}
 
-import requests
-
-# AI Demand Forecasting (REST API version - no SDK needed)
+# Demand forecasting (see forecasting.py for the available backends)
 @router.get("/ai/demand-forecast/{product_id}")
 def forecast_demand(
     product_id: int, 
     days_ahead: int = Query(7, ge=1, le=30),
+    backend: str = Query(forecasting.DEFAULT_BACKEND),
     db: Session = Depends(get_db)
 ):
-    """Smart demand forecasting with rule-based AI"""
-    
-    # Gather historical data
-    orders = db.query(models.OrderItem).filter(
-        models.OrderItem.product_id == product_id
-    ).all()
-    
+    """Forecast daily demand and a restock recommendation for a product"""
     product = db.query(models.Product).filter(models.Product.id == product_id).first()
-    
     if not product:
         raise HTTPException(status_code=404, detail="Product not found")
-    
-    # Prepare sales data by date
-    sales_by_date = {}
-    total_sales = 0
-    for order in orders:
-        date_key = order.order.date.isoformat()
-        sales_by_date[date_key] = sales_by_date.get(date_key, 0) + order.quantity
-        total_sales += order.quantity
-    
-    # Calculate metrics
-    num_days_with_sales = len(sales_by_date)
-    avg_daily_sales = total_sales / max(num_days_with_sales, 1) if total_sales > 0 else 5
-    
-    # Get recent trend (last 7 days vs previous 7 days)
-    recent_dates = sorted(sales_by_date.keys(), reverse=True)[:7]
-    older_dates = sorted(sales_by_date.keys(), reverse=True)[7:14]
-    
-    recent_avg = sum(sales_by_date[d] for d in recent_dates) / max(len(recent_dates), 1) if recent_dates else avg_daily_sales
-    older_avg = sum(sales_by_date[d] for d in older_dates) / max(len(older_dates), 1) if older_dates else avg_daily_sales
-    
-    # Determine trend
-    if recent_avg > older_avg * 1.2:
-        trend = "increasing"
-        trend_factor = 1.1
-    elif recent_avg < older_avg * 0.8:
-        trend = "decreasing"
-        trend_factor = 0.9
-    else:
-        trend = "stable"
-        trend_factor = 1.0
-    
-    # Risk assessment
-    if avg_daily_sales > 20:
-        risk_level = "high"
-        risk_reason = "High demand product - risk of stockout"
-    elif avg_daily_sales > 10:
-        risk_level = "medium"
-        risk_reason = "Moderate demand - monitor closely"
-    else:
-        risk_level = "low"
-        risk_reason = "Low demand - minimal risk"
-    
-    # Generate forecast
-    today = datetime.now().date()
-    daily_forecast = []
-    
-    for i in range(days_ahead):
-        forecast_date = (today + timedelta(days=i+1))
-        
-        # Add day-of-week variance (weekends might be different)
-        day_of_week = forecast_date.weekday()
-        weekend_factor = 1.2 if day_of_week in [5, 6] else 1.0  # Sat, Sun
-        
-        # Add slight randomness but keep it realistic
-        variance = 0.9 + (i % 3) * 0.1
-        
-        predicted_qty = max(1, int(avg_daily_sales * trend_factor * weekend_factor * variance))
-        
-        daily_forecast.append({
-            "date": forecast_date.isoformat(),
-            "predicted_quantity": predicted_qty
-        })
-    
-    # Calculate restock recommendation
-    total_forecast_demand = sum(f["predicted_quantity"] for f in daily_forecast)
-    restock_quantity = int(total_forecast_demand * 1.3)  # 30% buffer
-    restock_date = (today + timedelta(days=max(1, int(days_ahead / 3)))).isoformat()
-    
-    # Generate reasoning
-    reasoning = f"Based on {num_days_with_sales} days of sales data, average daily demand is {avg_daily_sales:.1f} units. "
-    reasoning += f"Trend is {trend}. {risk_reason}. "
-    reasoning += f"Recommended restock of {restock_quantity} units by {restock_date}."
-    
-    return {
-        "product_id": product_id,
-        "product_name": product.name,
-        "category": product.category,
-        "forecast": {
-            "daily_forecast": daily_forecast,
-            "restock_quantity": restock_quantity,
-            "restock_date": restock_date,
-            "risk_level": risk_level,
-            "reasoning": reasoning
-        },
-        "data_points_analyzed": num_days_with_sales,
-        "average_daily_sales": round(avg_daily_sales, 2),
-        "model_used": "intelligent-rule-based",
-        "trend": trend
-    }
\ No newline at end of file
+    return forecasting.forecast_product(db.for_product(product_id), product, days_ahead, backend)
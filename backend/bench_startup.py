@@ -0,0 +1,71 @@
+"""Startup benchmark: import time and peak RSS of `main:app`.
+
+Each run imports the app in a fresh interpreter. Exits non-zero if the median
+exceeds the limits or if a module that should load lazily (e.g. the Gemini SDK)
+was imported, so import regressions are caught.
+
+    python bench_startup.py --runs 5 --max-import-ms 1500 --max-rss-mb 150
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+# Modules that must not be imported just by loading the app
+LAZY_MODULES = ["google.generativeai", "requests", "grpc"]
+
+CHILD = """
+import json, resource, sys, time
+started = time.perf_counter()
+{imports}
+elapsed = time.perf_counter() - started
+rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+rss_mb = rss / (1024 * 1024) if sys.platform == "darwin" else rss / 1024
+print(json.dumps({{"import_ms": elapsed * 1000, "rss_mb": rss_mb, "loaded": [m for m in {lazy!r} if m in sys.modules]}}))
+"""
+
+
+def measure(imports: str, runs: int) -> dict:
+    here = os.path.dirname(os.path.abspath(__file__))
+    samples = []
+    for _ in range(runs):
+        out = subprocess.run(
+            [sys.executable, "-c", CHILD.format(imports=imports, lazy=LAZY_MODULES)],
+            cwd=here, capture_output=True, text=True, check=True,
+        ).stdout
+        samples.append(json.loads(out.strip().splitlines()[-1]))
+    return {
+        "import_ms": statistics.median(s["import_ms"] for s in samples),
+        "rss_mb": statistics.median(s["rss_mb"] for s in samples),
+        "loaded": sorted({m for s in samples for m in s["loaded"]}),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--max-import-ms", type=float, default=None)
+    parser.add_argument("--max-rss-mb", type=float, default=None)
+    args = parser.parse_args()
+
+    baseline = measure("pass", args.runs)
+    app = measure("import main", args.runs)
+    print(f"bare interpreter  rss {baseline['rss_mb']:6.1f} MB")
+    print(f"import main:app   {app['import_ms']:7.1f} ms  rss {app['rss_mb']:6.1f} MB")
+
+    failures = []
+    if app["loaded"]:
+        failures.append(f"lazily loaded modules were imported at startup: {', '.join(app['loaded'])}")
+    if args.max_import_ms is not None and app["import_ms"] > args.max_import_ms:
+        failures.append(f"import took {app['import_ms']:.1f} ms (limit {args.max_import_ms} ms)")
+    if args.max_rss_mb is not None and app["rss_mb"] > args.max_rss_mb:
+        failures.append(f"RSS {app['rss_mb']:.1f} MB (limit {args.max_rss_mb} MB)")
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
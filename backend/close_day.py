@@ -0,0 +1,13 @@
+from datetime import date
+import jobs
+
+# End-of-day job: write off expired stock and take the daily Inventory snapshot.
+# Runs through the job runner so it is recorded (and claimed) like the scheduled run.
+def close_today():
+    jobs.create_tables()
+    today = date.today()
+    for retailer_id, run in jobs.run_job_all_shards("close_day", today).items():
+        print(f"Closed {today} (shard {retailer_id}): {run.status}, {run.rows_processed} units spoiled.")
+
+if __name__ == "__main__":
+    close_today()
@@ -0,0 +1,107 @@
+import asyncio
+import os
+import time
+from typing import Awaitable, Callable, Dict, Tuple
+from fastapi import Request, Response
+from fastapi.routing import APIRoute
+
+# Single-flight request coalescing for GET routes.
+#
+# Concurrent GETs with the same path, query string and Accept header share one
+# execution of the endpoint (one database query, one encoded body). With a
+# non-zero SHELFSMART_COALESCE_TTL_MS the finished body is also reused for that
+# many milliseconds. Use it by creating a router with `route_class=CoalescingRoute`.
+
+TTL_SECONDS = float(os.environ.get("SHELFSMART_COALESCE_TTL_MS", "0")) / 1000
+MAX_RECENT = 1000
+
+stats = {"executed": 0, "coalesced": 0, "cached": 0}
+
+# key -> future resolving to (status_code, body, raw_headers)
+_inflight: Dict[tuple, asyncio.Future] = {}
+# key -> (expires_at, (status_code, body, raw_headers))
+_recent: Dict[tuple, Tuple[float, tuple]] = {}
+
+
+def _to_response(result: tuple) -> Response:
+    status_code, body, raw_headers = result
+    response = Response(content=body, status_code=status_code)
+    response.raw_headers = list(raw_headers)
+    return response
+
+
+def _remember(key: tuple, result: tuple):
+    now = time.monotonic()
+    if len(_recent) >= MAX_RECENT:
+        for stale in [k for k, (expires, _) in _recent.items() if expires <= now]:
+            del _recent[stale]
+        if len(_recent) >= MAX_RECENT:
+            return
+    _recent[key] = (now + TTL_SECONDS, result)
+
+
+async def single_flight(key: tuple, run: Callable[[], Awaitable[Response]]) -> Response:
+    if TTL_SECONDS:
+        cached = _recent.get(key)
+        if cached and cached[0] > time.monotonic():
+            stats["cached"] += 1
+            return _to_response(cached[1])
+
+    future = _inflight.get(key)
+    if future is not None:
+        stats["coalesced"] += 1
+        try:
+            result = await asyncio.shield(future)
+        except asyncio.CancelledError:
+            # The leading request was cancelled (e.g. client went away); run again
+            if future.cancelled():
+                return await single_flight(key, run)
+            raise
+        if result is None:
+            return await run()
+        return _to_response(result)
+
+    future = asyncio.get_running_loop().create_future()
+    _inflight[key] = future
+    stats["executed"] += 1
+    try:
+        response = await run()
+    except asyncio.CancelledError:
+        future.cancel()
+        raise
+    except Exception as exc:
+        future.set_exception(exc)
+        future.exception()  # mark retrieved when nobody was waiting
+        raise
+    finally:
+        _inflight.pop(key, None)
+
+    body = getattr(response, "body", None)
+    if body is None or response.background is not None:
+        # Streaming or side-effecting responses cannot be shared
+        future.set_result(None)
+        return response
+    result = (response.status_code, body, tuple(response.raw_headers))
+    future.set_result(result)
+    if TTL_SECONDS and response.status_code == 200:
+        _remember(key, result)
+    return response
+
+
+class CoalescingRoute(APIRoute):
+    """APIRoute that coalesces identical concurrent GET requests"""
+
+    def get_route_handler(self):
+        handler = super().get_route_handler()
+        if self.methods != {"GET"}:
+            return handler
+
+        async def coalescing_handler(request: Request) -> Response:
+            key = (
+                request.url.path,
+                tuple(sorted(request.query_params.multi_items())),
+                request.headers.get("accept", ""),
+            )
+            return await single_flight(key, lambda: handler(request))
+
+        return coalescing_handler
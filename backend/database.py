@@ -1,12 +1,43 @@
-from sqlalchemy import create_engine
+import os
+from sqlalchemy import create_engine, event, inspect
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 
-SQLALCHEMY_DATABASE_URL = "sqlite:///./shelfsmart.db"
+SQLALCHEMY_DATABASE_URL = os.environ.get("SHELFSMART_DATABASE_URL", "sqlite:///./shelfsmart.db")
+
+
+def make_engine(url: str):
+    sqlite_engine = create_engine(url, connect_args={"check_same_thread": False})
+
+    @event.listens_for(sqlite_engine, "connect")
+    def _set_sqlite_pragmas(dbapi_connection, connection_record):
+        # Only takes effect on a fresh database file; lets retention.compact() reclaim space incrementally
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA auto_vacuum = INCREMENTAL")
+        # WAL lets readers proceed while an order batch is being written
+        cursor.execute("PRAGMA journal_mode = WAL")
+        cursor.close()
+
+    return sqlite_engine
+
+
+engine = make_engine(SQLALCHEMY_DATABASE_URL)
 
-engine = create_engine(
-    SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False}
-)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 Base = declarative_base()
+
+
+def add_missing_columns(bind, tables=None):
+    # create_all() never alters existing tables; add new nullable columns in place
+    inspector = inspect(bind)
+    with bind.begin() as conn:
+        for table in tables or Base.metadata.sorted_tables:
+            if not inspector.has_table(table.name):
+                continue
+            existing = {c["name"] for c in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name not in existing and column.nullable:
+                    conn.exec_driver_sql(
+                        f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column.type.compile(dialect=bind.dialect)}"
+                    )
@@ -1,33 +1,39 @@
 from datetime import date
-from database import SessionLocal
+from sqlalchemy.orm import Session
 from models import ProductBatch, ProductPrice
 import random
 
-def decrement_today_prices():
-    today = date.today()
-    db = SessionLocal()
-    batches = db.query(ProductBatch).all()
-    updated = 0
+def decrement_prices_chunk(db: Session, day: date, after_id: int, limit: int):
+    """Nudge the `day` price of the next `limit` batches after `after_id` down a little.
+
+    Returns (last batch id or None when done, rows). The job runner checkpoints
+    the last id with each chunk, so no batch is decremented twice in one run.
+    """
+    batches = db.query(ProductBatch).filter(ProductBatch.id > after_id).order_by(ProductBatch.id).limit(limit).all()
+    if not batches:
+        return None, 0
+    prices_by_batch = {}
+    for price_obj in db.query(ProductPrice).filter(
+        ProductPrice.product_batch_id.in_([b.id for b in batches]),
+        ProductPrice.date == day,
+    ).order_by(ProductPrice.id).all():
+        if price_obj.product_batch_id in prices_by_batch:
+            print(f"Warning: Multiple prices for batch {price_obj.product_batch_id} on {day}. Using first.")
+            continue
+        prices_by_batch[price_obj.product_batch_id] = price_obj
     for batch in batches:
-        prices_today = db.query(ProductPrice).filter_by(product_batch_id=batch.id, date=today).all()
-        if len(prices_today) > 1:
-            print(f"Warning: Multiple prices for batch {batch.id} on {today}. Using first.")
-        if prices_today:
-            price_obj = prices_today[0]
+        price_obj = prices_by_batch.get(batch.id)
+        if price_obj:
             min_price = round(batch.base_price * 0.3, 2)
             old_price = price_obj.discounted_price
             decrement = round(random.uniform(0.01, 0.09), 2)
             new_price = max(min_price, round(old_price - decrement, 2))
-            if old_price <= min_price:
-                print(f"Batch {batch.id}: price already at minimum ({old_price})")
-            else:
+            if old_price > min_price:
                 price_obj.discounted_price = new_price
-                db.add(price_obj)
-                print(f"Batch {batch.id}: price {old_price} -> {new_price}")
-                updated += 1
-    db.commit()
-    # ...existing code...
-    print(f"Decremented today's prices for {updated} batches.")
+    return batches[-1].id, len(batches)
 
 if __name__ == "__main__":
-    decrement_today_prices()
+    import jobs
+    jobs.create_tables()
+    for retailer_id, run in jobs.run_job_all_shards("decrement_prices", date.today()).items():
+        print(f"Decremented today's prices (shard {retailer_id}: checked {run.rows_processed} batches, {run.status}).")
@@ -0,0 +1,220 @@
+import json
+import os
+from datetime import date, timedelta
+from typing import Dict, List
+from fastapi import HTTPException
+from sqlalchemy.orm import Session
+import models
+
+# Demand forecasting backends.
+#
+# A backend turns a product's daily sales history into per-day predictions;
+# `forecast_product` wraps that in the risk / restock summary the API returns.
+# Backends are looked up by name in BACKENDS. The LLM backend imports its SDK
+# on first use only, so the API process never pays for it unless asked.
+
+DEFAULT_BACKEND = os.environ.get("SHELFSMART_FORECAST_BACKEND", "rule-based")
+
+
+def load_daily_sales(db: Session, product_id: int) -> Dict[date, int]:
+    """Units sold per day, including days that have been archived into rollups"""
+    sales_by_date: Dict[date, int] = {}
+    rows = db.query(models.Order.date, models.OrderItem.quantity).join(
+        models.OrderItem, models.OrderItem.order_id == models.Order.id
+    ).filter(models.OrderItem.product_id == product_id).all()
+    for day, quantity in rows:
+        sales_by_date[day] = sales_by_date.get(day, 0) + quantity
+    for rollup in db.query(models.SalesRollup).filter(models.SalesRollup.product_id == product_id).all():
+        sales_by_date[rollup.date] = sales_by_date.get(rollup.date, 0) + rollup.quantity
+    return sales_by_date
+
+
+def _average_daily_sales(sales_by_date: Dict[date, int]) -> float:
+    total_sales = sum(sales_by_date.values())
+    return total_sales / max(len(sales_by_date), 1) if total_sales > 0 else 5
+
+
+def _trend(sales_by_date: Dict[date, int], avg_daily_sales: float):
+    # Recent trend (last 7 sale days vs previous 7 sale days)
+    recent_dates = sorted(sales_by_date.keys(), reverse=True)[:7]
+    older_dates = sorted(sales_by_date.keys(), reverse=True)[7:14]
+
+    recent_avg = sum(sales_by_date[d] for d in recent_dates) / max(len(recent_dates), 1) if recent_dates else avg_daily_sales
+    older_avg = sum(sales_by_date[d] for d in older_dates) / max(len(older_dates), 1) if older_dates else avg_daily_sales
+
+    if recent_avg > older_avg * 1.2:
+        return "increasing", 1.1
+    if recent_avg < older_avg * 0.8:
+        return "decreasing", 0.9
+    return "stable", 1.0
+
+
+class ForecastBackend:
+    """Predict daily demand for the `days_ahead` days after `today`"""
+
+    name = ""
+
+    def predict(self, sales_by_date: Dict[date, int], days_ahead: int, today: date) -> List[int]:
+        raise NotImplementedError
+
+
+class RuleBasedBackend(ForecastBackend):
+    name = "intelligent-rule-based"
+
+    def predict(self, sales_by_date, days_ahead, today):
+        avg_daily_sales = _average_daily_sales(sales_by_date)
+        _, trend_factor = _trend(sales_by_date, avg_daily_sales)
+        predictions = []
+        for i in range(days_ahead):
+            forecast_date = today + timedelta(days=i+1)
+            # Weekends sell a little more
+            weekend_factor = 1.2 if forecast_date.weekday() in [5, 6] else 1.0
+            # Slight deterministic variance to keep the curve realistic
+            variance = 0.9 + (i % 3) * 0.1
+            predictions.append(max(1, int(avg_daily_sales * trend_factor * weekend_factor * variance)))
+        return predictions
+
+
+class HoltWintersBackend(ForecastBackend):
+    """Additive Holt-Winters with a weekly season over the dense daily series.
+
+    Falls back to a seasonal-naive forecast (repeat last week) with under two
+    weeks of history, and to the flat average with under one week.
+    """
+
+    name = "holt-winters"
+    season = 7
+    alpha = 0.3
+    beta = 0.05
+    gamma = 0.2
+
+    def predict(self, sales_by_date, days_ahead, today):
+        if not sales_by_date:
+            return [max(1, int(_average_daily_sales(sales_by_date)))] * days_ahead
+        # Orders dated after today are not history yet, but they are demand already booked
+        history = {d: q for d, q in sales_by_date.items() if d <= today}
+        booked = {d: q for d, q in sales_by_date.items() if d > today}
+        start = min(history, default=today)
+        series = [history.get(start + timedelta(days=i), 0) for i in range((today - start).days + 1)]
+        ahead = self._forecast(series, days_ahead)
+        return [max(ahead[i], booked.get(today + timedelta(days=i + 1), 0)) for i in range(days_ahead)]
+
+    def _forecast(self, series: List[int], horizon: int) -> List[int]:
+        """The `horizon` values after the end of `series` (which is never empty)"""
+        m = self.season
+        n = len(series)
+
+        if n < m:
+            mean = sum(series) / n
+            return [max(0, round(mean))] * horizon
+        if n < 2 * m:
+            last_week = series[-m:]
+            return [last_week[h % m] for h in range(horizon)]
+
+        level = sum(series[:m]) / m
+        trend = (sum(series[m:2 * m]) - sum(series[:m])) / (m * m)
+        seasonal = [y - level for y in series[:m]]
+        for t, y in enumerate(series):
+            s = seasonal[t % m]
+            prev_level = level
+            level = self.alpha * (y - s) + (1 - self.alpha) * (level + trend)
+            trend = self.beta * (level - prev_level) + (1 - self.beta) * trend
+            seasonal[t % m] = self.gamma * (y - level) + (1 - self.gamma) * s
+        return [max(0, round(level + h * trend + seasonal[(n - 1 + h) % m])) for h in range(1, horizon + 1)]
+
+
+class GeminiBackend(ForecastBackend):
+    """Ask a Gemini model for the forecast. Needs GEMINI_API_KEY; the SDK is imported on first use."""
+
+    name = "gemini"
+
+    def __init__(self):
+        self._model = None
+
+    def _get_model(self):
+        if self._model is None:
+            api_key = os.environ.get("GEMINI_API_KEY", "")
+            if not api_key:
+                raise HTTPException(status_code=503, detail="Gemini forecasting is not configured")
+            import google.generativeai as genai
+            genai.configure(api_key=api_key)
+            self._model = genai.GenerativeModel(os.environ.get("GEMINI_MODEL", "gemini-1.5-flash"))
+        return self._model
+
+    def predict(self, sales_by_date, days_ahead, today):
+        history = {d.isoformat(): q for d, q in sorted(sales_by_date.items())}
+        prompt = (
+            f"Daily units sold for a grocery product: {json.dumps(history)}. "
+            f"Today is {today.isoformat()}. Predict units sold for each of the next {days_ahead} days. "
+            f"Reply with only a JSON array of {days_ahead} integers."
+        )
+        text = self._get_model().generate_content(prompt).text
+        try:
+            values = json.loads(text[text.index("["):text.rindex("]") + 1])
+            predictions = [max(0, int(v)) for v in values[:days_ahead]]
+        except (ValueError, TypeError):
+            raise HTTPException(status_code=502, detail="Could not parse forecast from Gemini")
+        if len(predictions) < days_ahead:
+            raise HTTPException(status_code=502, detail=f"Gemini returned {len(predictions)} of {days_ahead} daily values")
+        return predictions
+
+
+BACKENDS: Dict[str, ForecastBackend] = {
+    "rule-based": RuleBasedBackend(),
+    "holt-winters": HoltWintersBackend(),
+    "gemini": GeminiBackend(),
+}
+
+
+def forecast_product(db: Session, product: models.Product, days_ahead: int, backend: str = DEFAULT_BACKEND) -> dict:
+    if backend not in BACKENDS:
+        raise HTTPException(status_code=400, detail=f"Unknown forecast backend: {backend}")
+    model = BACKENDS[backend]
+    sales_by_date = load_daily_sales(db, product.id)
+    avg_daily_sales = _average_daily_sales(sales_by_date)
+    trend, _ = _trend(sales_by_date, avg_daily_sales)
+    num_days_with_sales = len(sales_by_date)
+
+    # Risk assessment
+    if avg_daily_sales > 20:
+        risk_level = "high"
+        risk_reason = "High demand product - risk of stockout"
+    elif avg_daily_sales > 10:
+        risk_level = "medium"
+        risk_reason = "Moderate demand - monitor closely"
+    else:
+        risk_level = "low"
+        risk_reason = "Low demand - minimal risk"
+
+    today = date.today()
+    predictions = model.predict(sales_by_date, days_ahead, today)
+    daily_forecast = [
+        {"date": (today + timedelta(days=i+1)).isoformat(), "predicted_quantity": qty}
+        for i, qty in enumerate(predictions)
+    ]
+
+    # Restock recommendation
+    total_forecast_demand = sum(f["predicted_quantity"] for f in daily_forecast)
+    restock_quantity = int(total_forecast_demand * 1.3)  # 30% buffer
+    restock_date = (today + timedelta(days=max(1, int(days_ahead / 3)))).isoformat()
+
+    reasoning = f"Based on {num_days_with_sales} days of sales data, average daily demand is {avg_daily_sales:.1f} units. "
+    reasoning += f"Trend is {trend}. {risk_reason}. "
+    reasoning += f"Recommended restock of {restock_quantity} units by {restock_date}."
+
+    return {
+        "product_id": product.id,
+        "product_name": product.name,
+        "category": product.category,
+        "forecast": {
+            "daily_forecast": daily_forecast,
+            "restock_quantity": restock_quantity,
+            "restock_date": restock_date,
+            "risk_level": risk_level,
+            "reasoning": reasoning
+        },
+        "data_points_analyzed": num_days_with_sales,
+        "average_daily_sales": round(avg_daily_sales, 2),
+        "model_used": model.name,
+        "trend": trend
+    }
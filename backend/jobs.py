@@ -0,0 +1,281 @@
+import asyncio
+import os
+import time
+from datetime import date, datetime, time as dtime, timedelta
+from typing import Dict, Optional
+from sqlalchemy import func, or_, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from database import engine, add_missing_columns
+from models import Base, JobRun
+import shards
+import stock
+import retention
+from update_prices import update_prices_chunk
+from decrement_today_prices import decrement_prices_chunk
+
+# In-process job scheduler.
+#
+# A job is a chunk function `(db, run_date, after_id, limit) -> (last_id, rows)`
+# that processes the next `limit` rows after `after_id` and returns
+# `(None, 0)` when there is nothing left. `run_job` commits each chunk together
+# with its JobRun checkpoint, so every transaction is short, a crashed run
+# resumes from the last committed chunk, and a finished (name, date) run is
+# never repeated.
+#
+# A runner must claim a run before touching it: the claim is a single
+# conditional UPDATE that only succeeds when the run is not DONE and nobody
+# holds a live lease (RUNNING with a heartbeat younger than LEASE_SECONDS).
+# Every checkpoint renews the heartbeat and is itself conditional on it, so
+# the scheduler, an API trigger and other worker processes never process the
+# same (name, date) at once, and a runner whose lease was taken over has its
+# in-flight chunk rolled back instead of applied twice.
+#
+# Each claim counts an attempt. The scheduler retries a FAILED run only after
+# RETRY_SECONDS * 2**(attempts - 1) have passed since it failed, and leaves it
+# alone after MAX_ATTEMPTS; `python jobs.py <job>` and POST /jobs/{name}/run
+# still retry it straight away.
+
+CHUNK_SIZE = 200
+POLL_SECONDS = 60
+LEASE_SECONDS = int(os.environ.get("SHELFSMART_JOB_LEASE_SECONDS", "600"))
+# Scheduled runs missed while the process was down are caught up for this many days
+CATCHUP_DAYS = int(os.environ.get("SHELFSMART_JOB_CATCHUP_DAYS", "3"))
+# Scheduler backoff for runs that keep failing
+RETRY_SECONDS = int(os.environ.get("SHELFSMART_JOB_RETRY_SECONDS", "300"))
+MAX_ATTEMPTS = int(os.environ.get("SHELFSMART_JOB_MAX_ATTEMPTS", "5"))
+SCHEDULER_ENABLED = os.environ.get("SHELFSMART_SCHEDULER", "1") == "1"
+
+
+class LeaseLost(RuntimeError):
+    """Another runner took over a job run this runner was processing"""
+
+
+def _single_step(fn):
+    # Wrap a job that does all its work in one call (it may commit internally)
+    def chunk(db: Session, run_date: date, after_id: int, limit: int):
+        if after_id:
+            return None, 0
+        return 1, fn(db, run_date)
+    return chunk
+
+
+def _close_day(db: Session, run_date: date) -> int:
+    return stock.close_day(db, run_date)
+
+
+def _retention(db: Session, run_date: date) -> int:
+    moved = retention.archive_prices(db, run_date) + retention.archive_orders(db, run_date)
+    retention.compact(bind=db.get_bind())
+    return moved
+
+
+JOBS = {
+    "update_prices": update_prices_chunk,
+    "decrement_prices": decrement_prices_chunk,
+    "close_day": _single_step(_close_day),
+    "retention": _single_step(_retention),
+}
+
+# (job name, local time of day to run, offset from today to the run date,
+#  whether a missed slot is caught up later)
+SCHEDULE = [
+    # A markdown only matters on the day it is shown, so missed ones are skipped
+    ("decrement_prices", dtime(12, 0), 0, False),
+    ("update_prices", dtime(23, 30), 1, True),
+    ("close_day", dtime(23, 55), 0, True),
+]
+# Retention archives and deletes live rows; scheduled only with SHELFSMART_RETENTION=1
+if retention.RETENTION_ENABLED:
+    SCHEDULE.insert(0, ("retention", dtime(3, 0), 0, True))
+
+
+def _get_or_create_run(db: Session, name: str, run_date: date) -> JobRun:
+    run = db.query(JobRun).filter_by(name=name, run_date=run_date).first()
+    if run is None:
+        db.add(JobRun(name=name, run_date=run_date, status="PENDING", cursor=0, rows_processed=0, duration_ms=0.0))
+        try:
+            db.commit()
+        except IntegrityError:
+            # Another runner inserted the same (name, run_date) first
+            db.rollback()
+        run = db.query(JobRun).filter_by(name=name, run_date=run_date).one()
+    return run
+
+
+def _claim(db: Session, run_id: int) -> Optional[datetime]:
+    """Take over run `run_id` if it is free. Returns the lease token, or None if it is held or DONE."""
+    now = datetime.now()
+    claimed = db.execute(
+        update(JobRun)
+        .where(
+            JobRun.id == run_id,
+            JobRun.status != "DONE",
+            or_(
+                JobRun.status != "RUNNING",
+                JobRun.heartbeat.is_(None),
+                JobRun.heartbeat < now - timedelta(seconds=LEASE_SECONDS),
+            ),
+        )
+        .values(status="RUNNING", heartbeat=now, error=None, started_at=now, attempts=func.coalesce(JobRun.attempts, 0) + 1)
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    db.commit()
+    return now if claimed else None
+
+
+def _checkpoint(db: Session, run_id: int, lease: Optional[datetime], **values) -> Optional[datetime]:
+    """Write `values` and renew the lease, in the caller's transaction, if `lease` is still ours"""
+    if lease is None:
+        return None
+    now = datetime.now()
+    updated = db.execute(
+        update(JobRun)
+        .where(JobRun.id == run_id, JobRun.heartbeat == lease)
+        .values(heartbeat=now, **values)
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    return now if updated else None
+
+
+def run_job(name: str, run_date: date, retailer_id: Optional[int] = None, chunk_size: int = CHUNK_SIZE) -> JobRun:
+    """Run (or resume) job `name` for `run_date` on one shard.
+
+    A run that is DONE, or currently held by another runner, is returned untouched.
+    """
+    if name not in JOBS:
+        raise ValueError(f"Unknown job: {name}")
+    chunk = JOBS[name]
+    db = shards.shard_session(retailer_id)
+    try:
+        run = _get_or_create_run(db, name, run_date)
+        lease = _claim(db, run.id) if run.status != "DONE" else None
+        db.refresh(run)
+        if lease is None:
+            return run
+        cursor, rows_processed, duration_ms = run.cursor, run.rows_processed, run.duration_ms
+
+        started = time.perf_counter()
+        try:
+            while True:
+                last_id, rows = chunk(db, run_date, cursor, chunk_size)
+                if last_id is None:
+                    break
+                cursor = last_id
+                rows_processed += rows
+                duration_ms += (time.perf_counter() - started) * 1000
+                started = time.perf_counter()
+                # The chunk commits together with its checkpoint, or not at all
+                lease = _checkpoint(db, run.id, lease, cursor=cursor, rows_processed=rows_processed, duration_ms=duration_ms)
+                if lease is None:
+                    raise LeaseLost(f"Job {name} for {run_date} was taken over by another runner")
+                db.commit()
+        except Exception as exc:
+            db.rollback()
+            duration_ms += (time.perf_counter() - started) * 1000
+            # No-op when the lease was lost: the run belongs to someone else now
+            _checkpoint(db, run.id, lease, status="FAILED", error=str(exc), duration_ms=duration_ms)
+            db.commit()
+            raise
+
+        duration_ms += (time.perf_counter() - started) * 1000
+        _checkpoint(db, run.id, lease, status="DONE", duration_ms=duration_ms, finished_at=datetime.now())
+        db.commit()
+        db.refresh(run)
+        return run
+    finally:
+        db.close()
+
+
+def run_job_all_shards(name: str, run_date: date) -> Dict[int, JobRun]:
+    """Run job `name` for `run_date` on every shard, keyed by retailer id (0 = main database).
+
+    A failing shard does not stop the others; the errors are raised together at the end.
+    """
+    runs, errors = {}, []
+    for retailer_id in shards.shard_ids():
+        try:
+            runs[retailer_id] = run_job(name, run_date, retailer_id)
+        except Exception as exc:
+            errors.append(f"shard {retailer_id}: {exc}")
+    if errors:
+        raise RuntimeError(f"Job {name} for {run_date} failed on " + "; ".join(errors))
+    return runs
+
+
+def create_tables():
+    # Standalone runs may start before the API has ever created the newer tables
+    Base.metadata.create_all(bind=engine)
+    add_missing_columns(engine)
+
+
+def due_jobs(now: datetime, catchup_days: int = CATCHUP_DAYS):
+    """Scheduled (name, run_date) pairs whose slot has passed, oldest first.
+
+    Slots from the previous `catchup_days` days are included, so a process that
+    was down at 23:55 still writes that day's close_day snapshot when it is back.
+    """
+    for days_ago in range(catchup_days, -1, -1):
+        day = now.date() - timedelta(days=days_ago)
+        for name, at, offset, catch_up in SCHEDULE:
+            if days_ago and not catch_up:
+                continue
+            if days_ago or now.time() >= at:
+                yield name, day + timedelta(days=offset)
+
+
+def _backing_off(run: JobRun, now: datetime) -> bool:
+    """A FAILED run the scheduler should not retry yet (or at all, after MAX_ATTEMPTS)"""
+    attempts = run.attempts or 0
+    if run.status != "FAILED" or attempts == 0:
+        return False
+    if attempts >= MAX_ATTEMPTS:
+        return True
+    return run.heartbeat is not None and now < run.heartbeat + timedelta(seconds=RETRY_SECONDS * 2 ** (attempts - 1))
+
+
+def run_due_jobs(now: Optional[datetime] = None):
+    now = now or datetime.now()
+    # Every shard keeps its own job runs and is processed independently
+    for retailer_id in shards.shard_ids():
+        db = shards.shard_session(retailer_id)
+        try:
+            # Never backfill days from before the scheduler first ran on this shard
+            first_run = db.query(func.min(JobRun.started_at)).scalar()
+            catchup_days = min(CATCHUP_DAYS, (now.date() - first_run.date()).days) if first_run else 0
+            since = now.date() - timedelta(days=catchup_days)
+            # Skip finished runs, and failed ones that are still backing off
+            skip = {
+                (r.name, r.run_date)
+                for r in db.query(JobRun).filter(JobRun.status.in_(["DONE", "FAILED"]), JobRun.run_date >= since).all()
+                if r.status == "DONE" or _backing_off(r, now)
+            }
+        finally:
+            db.close()
+        for name, run_date in due_jobs(now, catchup_days):
+            if (name, run_date) in skip:
+                continue
+            try:
+                run_job(name, run_date, retailer_id)
+            except Exception as exc:
+                print(f"Job {name} for {run_date} (shard {retailer_id}) failed: {exc}")
+
+
+async def run_scheduler(poll_seconds: int = POLL_SECONDS):
+    """Poll the schedule forever, running due jobs off the event loop"""
+    while True:
+        await asyncio.to_thread(run_due_jobs)
+        await asyncio.sleep(poll_seconds)
+
+
+if __name__ == "__main__":
+    import sys
+    # `python jobs.py` runs the scheduler as a worker process;
+    # `python jobs.py <job> [YYYY-MM-DD]` runs a single job.
+    create_tables()
+    if len(sys.argv) > 1:
+        run_date = datetime.strptime(sys.argv[2], "%Y-%m-%d").date() if len(sys.argv) > 2 else date.today()
+        for retailer_id, run in run_job_all_shards(sys.argv[1], run_date).items():
+            print(f"{run.name} {run.run_date} (shard {retailer_id}): {run.status}, {run.rows_processed} rows in {run.duration_ms:.0f} ms")
+    else:
+        asyncio.run(run_scheduler())
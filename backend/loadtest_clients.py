@@ -0,0 +1,315 @@
+"""Client-behaviour load test: replays what the frontend does to the API.
+
+Every virtual user runs one scenario in a loop until --duration is up:
+
+  marketplace  Marketplace.tsx: products, then batches, then one discounted-price
+               call per batch in parallel, every 30 s; in between, the prices-only
+               poll every 10 s
+  dashboard    Retailer / Vendor dashboard mount: products, batches, inventories
+               and orders in parallel, then a think time before the next visit
+  shopper      loads products and batches, puts 1-3 in-stock batches in the
+               cart, places the order and reloads both lists like the checkout
+
+By default the app from main.py runs in-process against a freshly seeded scratch
+SQLite file. SQL statements are then counted per scenario: a statement is charged
+to the scenario whose request ran it, and statements outside any request (order
+queue writer, scheduler) to "background". With --url the same traffic goes to a
+running instance instead, without query counts. Like a browser, each user keeps
+at most --connections-per-user requests in flight. --time-scale shortens every
+client timer, e.g. 10 turns the 30 s poll into 3 s.
+
+    python loadtest_clients.py --users 200 --mix marketplace=80,dashboard=5,shopper=15 --duration 60 --time-scale 10
+
+Server-side settings (SHELFSMART_ORDER_QUEUE, SHELFSMART_COALESCE_TTL_MS, ...)
+are read from the environment as usual, so runs can be compared by toggling them.
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import random
+import tempfile
+import threading
+import time
+from collections import Counter
+from contextvars import ContextVar
+from datetime import date
+
+# Point the app at a scratch database before it is imported
+_tmpdir = tempfile.mkdtemp(prefix="shelfsmart-loadtest-")
+os.environ["SHELFSMART_DATABASE_URL"] = f"sqlite:///{os.path.join(_tmpdir, 'loadtest.db')}"
+os.environ["SHELFSMART_SHARD_DIR"] = os.path.join(_tmpdir, "shards")
+os.environ.setdefault("SHELFSMART_SCHEDULER", "0")
+
+import httpx
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+import main
+import models
+import seeder
+import stock
+from database import SessionLocal, engine
+
+SCENARIOS = ["marketplace", "dashboard", "shopper"]
+
+# SQL statements per scenario, attributed through the scenario contextvar
+current_scenario: ContextVar[str] = ContextVar("current_scenario", default="background")
+query_counts: Counter = Counter()
+_query_counts_lock = threading.Lock()
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _count_query(conn, cursor, statement, parameters, context, executemany):
+    with _query_counts_lock:
+        query_counts[current_scenario.get()] += 1
+
+
+def seed_database(days: int, extra_stock: int):
+    models.Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    try:
+        seeder.seed_data(db, days)
+        # One long-dated batch per product so shoppers do not empty the shelves mid-run
+        for product in db.query(models.Product).all():
+            batch = models.ProductBatch(
+                product_id=product.id,
+                manufacture_date=date.today(),
+                expiry_date=date(2099, 1, 1),
+                base_price=5.0,
+                quantity=extra_stock,
+            )
+            db.add(batch)
+            db.flush()
+            stock.receive_batch(db, batch)
+        db.commit()
+    finally:
+        db.close()
+
+
+class ScenarioStats:
+    def __init__(self, name: str):
+        self.name = name
+        self.users = 0
+        self.latencies = []
+        self.errors = 0    # 5xx and transport failures
+        self.rejected = 0  # 4xx, e.g. an order for stock that ran out
+
+    def record(self, elapsed: float, status_code):
+        self.latencies.append(elapsed)
+        if status_code is None or status_code >= 500:
+            self.errors += 1
+        elif status_code >= 400:
+            self.rejected += 1
+
+    def percentile(self, p: float) -> float:
+        ordered = sorted(self.latencies)
+        return ordered[max(0, math.ceil(p * len(ordered)) - 1)] if ordered else 0.0
+
+
+class VirtualUser:
+    def __init__(self, client: httpx.AsyncClient, stats: ScenarioStats, args, deadline: float):
+        self.client = client
+        self.stats = stats
+        self.args = args
+        self.deadline = deadline
+        self.slots = asyncio.Semaphore(args.connections_per_user)
+
+    async def request(self, method: str, path: str, **kwargs):
+        """Response JSON, or None when the request failed"""
+        async with self.slots:
+            started = time.perf_counter()
+            try:
+                response = await self.client.request(method, path, **kwargs)
+            except httpx.HTTPError:
+                self.stats.record(time.perf_counter() - started, None)
+                return None
+            self.stats.record(time.perf_counter() - started, response.status_code)
+        return response.json() if response.status_code < 400 else None
+
+    async def get(self, path: str):
+        return await self.request("GET", path)
+
+    async def sleep(self, seconds: float) -> bool:
+        """Wait `seconds` of client time; False once the run is over"""
+        wake_at = time.monotonic() + seconds / self.args.time_scale
+        if wake_at >= self.deadline:
+            return False
+        await asyncio.sleep(wake_at - time.monotonic())
+        return True
+
+    async def wait_until(self, wake_at: float) -> bool:
+        if max(wake_at, time.monotonic()) >= self.deadline:
+            return False
+        await asyncio.sleep(max(0.0, wake_at - time.monotonic()))
+        return True
+
+
+async def fetch_batch_prices(user: VirtualUser, batches: list):
+    await asyncio.gather(*(
+        user.get(f"/api/v1/product-batch-discounted-price/?product_batch_id={batch['id']}") for batch in batches
+    ))
+
+
+async def marketplace(user: VirtualUser):
+    # setInterval fires on a fixed cadence; fetchProducts resets the price poll,
+    # so a full reload happens on every third 10 s tick and prices-only on the others
+    tick = user.args.price_poll_seconds / user.args.time_scale
+    full_every = max(1, round(user.args.poll_seconds / user.args.price_poll_seconds))
+    if not await user.sleep(random.uniform(0, user.args.poll_seconds)):
+        return
+    started = time.monotonic()
+    batches = []
+    n = 0
+    while True:
+        if n % full_every == 0:
+            await user.get("/api/v1/products/")
+            batches = await user.get("/api/v1/product-batches/") or batches
+        await fetch_batch_prices(user, batches)
+        # Ticks missed while the previous round was still running are skipped
+        n = max(n + 1, math.ceil((time.monotonic() - started) / tick))
+        if not await user.wait_until(started + n * tick):
+            return
+
+
+async def dashboard(user: VirtualUser):
+    if not await user.sleep(random.uniform(0, user.args.dashboard_think)):
+        return
+    while True:
+        await asyncio.gather(
+            user.get("/api/v1/products/"),
+            user.get("/api/v1/product-batches/"),
+            user.get("/api/v1/inventories/"),
+            user.get("/api/v1/orders/"),
+        )
+        if not await user.sleep(user.args.dashboard_think):
+            return
+
+
+async def shopper(user: VirtualUser):
+    if not await user.sleep(random.uniform(0, user.args.shopper_think)):
+        return
+    while True:
+        await user.get("/api/v1/products/")
+        batches = await user.get("/api/v1/product-batches/") or []
+        if not await user.sleep(user.args.shopper_think):
+            return
+        today = date.today().isoformat()
+        in_stock = [b for b in batches if b["quantity"] > 0 and b["expiry_date"] >= today]
+        if in_stock:
+            cart = random.sample(in_stock, min(len(in_stock), random.randint(1, 3)))
+            items = [{"product_id": b["product_id"], "quantity": random.randint(1, 3), "price": b["base_price"]} for b in cart]
+            await user.request("POST", "/api/v1/orders/", json={
+                "date": today,
+                "total_price": round(sum(item["quantity"] * item["price"] for item in items), 2),
+                "items": items,
+            })
+            await user.get("/api/v1/products/")
+            await user.get("/api/v1/product-batches/")
+
+
+BEHAVIOURS = {"marketplace": marketplace, "dashboard": dashboard, "shopper": shopper}
+
+
+def parse_mix(mix: str) -> dict:
+    weights = {}
+    for part in mix.split(","):
+        name, _, weight = part.partition("=")
+        name = name.strip()
+        if name not in BEHAVIOURS:
+            raise SystemExit(f"unknown scenario {name!r}; choose from {', '.join(SCENARIOS)}")
+        weights[name] = float(weight or 1)
+    return weights
+
+
+def assign_users(users: int, weights: dict) -> dict:
+    """Split `users` by weight, largest remainder first so the counts add up"""
+    total = sum(weights.values())
+    shares = {name: users * weight / total for name, weight in weights.items()}
+    counts = {name: int(share) for name, share in shares.items()}
+    for name in sorted(shares, key=lambda n: shares[n] - counts[n], reverse=True)[:users - sum(counts.values())]:
+        counts[name] += 1
+    return counts
+
+
+async def run_users(client: httpx.AsyncClient, args, counts: dict) -> tuple:
+    stats = {name: ScenarioStats(name) for name in counts}
+    deadline = time.monotonic() + args.duration
+    tasks = []
+    for name, count in counts.items():
+        stats[name].users = count
+        for _ in range(count):
+            user = VirtualUser(client, stats[name], args, deadline)
+            # Each task starts with its own copy of the context, so this only tags that user
+            current_scenario.set(name)
+            tasks.append(asyncio.create_task(BEHAVIOURS[name](user)))
+    current_scenario.set("background")
+    started = time.monotonic()
+    await asyncio.gather(*tasks)
+    return stats, time.monotonic() - started
+
+
+async def main_async(args):
+    random.seed(args.seed)
+    counts = assign_users(args.users, parse_mix(args.mix))
+    if args.url:
+        limits = httpx.Limits(max_connections=args.users * args.connections_per_user)
+        async with httpx.AsyncClient(base_url=args.url, timeout=60, limits=limits) as client:
+            stats, elapsed = await run_users(client, args, counts)
+        queries = None
+    else:
+        seed_database(args.seed_days, args.stock)
+        async with main.app.router.lifespan_context(main.app):
+            transport = httpx.ASGITransport(app=main.app, raise_app_exceptions=False)
+            async with httpx.AsyncClient(transport=transport, base_url="http://loadtest", timeout=60) as client:
+                query_counts.clear()
+                stats, elapsed = await run_users(client, args, counts)
+        queries = dict(query_counts)
+
+    print(f"{args.users} users for {elapsed:.1f} s (time scale {args.time_scale:g}x), target {args.url or 'in-process'}")
+    print(f"  {'scenario':<12}{'users':>6}{'requests':>10}{'req/s':>8}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'errors':>8}{'4xx':>6}{'queries':>9}{'q/req':>7}")
+    report = []
+    for s in stats.values():
+        n = len(s.latencies)
+        row = {
+            "scenario": s.name,
+            "users": s.users,
+            "requests": n,
+            "requests_per_sec": n / elapsed if elapsed else 0.0,
+            "p50_ms": s.percentile(0.50) * 1000,
+            "p95_ms": s.percentile(0.95) * 1000,
+            "p99_ms": s.percentile(0.99) * 1000,
+            "error_rate": s.errors / n if n else 0.0,
+            "rejected": s.rejected,
+            "queries": queries.get(s.name, 0) if queries is not None else None,
+        }
+        report.append(row)
+        q = f"{row['queries']:>9}{row['queries'] / max(n, 1):>7.1f}" if queries is not None else f"{'-':>9}{'-':>7}"
+        print(f"  {s.name:<12}{s.users:>6}{n:>10}{row['requests_per_sec']:>8.1f}{row['p50_ms']:>9.1f}{row['p95_ms']:>9.1f}"
+              f"{row['p99_ms']:>9.1f}{row['error_rate']:>7.1%} {s.rejected:>5}{q}")
+    if queries is not None:
+        print(f"  {'background':<12}{'':>57}{queries.get('background', 0):>9}")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"users": args.users, "mix": counts, "elapsed_s": elapsed, "time_scale": args.time_scale,
+                       "target": args.url or "in-process", "scenarios": report,
+                       "background_queries": queries.get("background", 0) if queries is not None else None}, f, indent=2)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--mix", default="marketplace=80,dashboard=5,shopper=15", help="scenario=weight,...")
+    parser.add_argument("--duration", type=float, default=60, help="wall-clock seconds")
+    parser.add_argument("--time-scale", type=float, default=1.0, help="divide every client timer by this")
+    parser.add_argument("--poll-seconds", type=float, default=30, help="Marketplace full reload interval")
+    parser.add_argument("--price-poll-seconds", type=float, default=10, help="Marketplace price poll interval")
+    parser.add_argument("--dashboard-think", type=float, default=60, help="seconds between dashboard visits")
+    parser.add_argument("--shopper-think", type=float, default=20, help="seconds a shopper browses before checkout")
+    parser.add_argument("--connections-per-user", type=int, default=6, help="concurrent requests per user, as in a browser")
+    parser.add_argument("--url", help="load a running instance instead of the in-process app")
+    parser.add_argument("--seed-days", type=int, default=7, help="days of history seeded in-process")
+    parser.add_argument("--stock", type=int, default=100_000, help="units of long-dated stock per product")
+    parser.add_argument("--seed", type=int, default=0, help="random seed for seeding and user behaviour")
+    parser.add_argument("--json", help="also write the results to this file")
+    asyncio.run(main_async(parser.parse_args()))
@@ -0,0 +1,106 @@
+"""Order placement load test: per-request commits vs. the group-commit queue.
+
+Runs the app in-process against a throwaway SQLite file and fires concurrent
+POST /api/v1/orders/ requests, once per mode, then prints orders per second.
+
+    python loadtest_orders.py --clients 50 --orders 2000
+"""
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+from datetime import date
+
+# Point the app at a scratch database before it is imported
+_tmpdir = tempfile.mkdtemp(prefix="shelfsmart-loadtest-")
+os.environ["SHELFSMART_DATABASE_URL"] = f"sqlite:///{os.path.join(_tmpdir, 'loadtest.db')}"
+os.environ["SHELFSMART_SCHEDULER"] = "0"
+
+import httpx
+import main
+import models
+import orders
+import stock
+from database import SessionLocal, engine
+
+
+def setup_catalog(num_products: int = 20) -> list:
+    models.Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    try:
+        products = [models.Product(name=f"Load Product {i}", category="Load") for i in range(num_products)]
+        db.add_all(products)
+        db.flush()
+        for product in products:
+            batch = models.ProductBatch(
+                product_id=product.id,
+                manufacture_date=date.today(),
+                expiry_date=date(2099, 1, 1),
+                base_price=1.0,
+                quantity=10_000_000,
+            )
+            db.add(batch)
+            db.flush()
+            stock.receive_batch(db, batch)
+        db.commit()
+        return [p.id for p in products]
+    finally:
+        db.close()
+
+
+async def run_mode(use_queue: bool, product_ids: list, clients: int, total: int) -> dict:
+    orders.QUEUE_ENABLED = use_queue
+    latencies = []
+    errors = 0
+    async with main.app.router.lifespan_context(main.app):
+        transport = httpx.ASGITransport(app=main.app, raise_app_exceptions=False)
+        async with httpx.AsyncClient(transport=transport, base_url="http://loadtest", timeout=60) as client:
+            remaining = iter(range(total))
+
+            async def shopper():
+                nonlocal errors
+                for i in remaining:
+                    payload = {
+                        "date": date.today().isoformat(),
+                        "total_price": 2.0,
+                        "items": [
+                            {"product_id": product_ids[i % len(product_ids)], "quantity": 1, "price": 1.0},
+                            {"product_id": product_ids[(i * 7 + 3) % len(product_ids)], "quantity": 1, "price": 1.0},
+                        ],
+                    }
+                    started = time.perf_counter()
+                    response = await client.post("/api/v1/orders/", json=payload)
+                    latencies.append(time.perf_counter() - started)
+                    if response.status_code != 200:
+                        errors += 1
+
+            started = time.perf_counter()
+            await asyncio.gather(*(shopper() for _ in range(clients)))
+            elapsed = time.perf_counter() - started
+    latencies.sort()
+    return {
+        "mode": "group-commit queue" if use_queue else "per-request commit",
+        "orders_per_sec": (total - errors) / elapsed,
+        "errors": errors,
+        "p50_ms": latencies[len(latencies) // 2] * 1000,
+        "p99_ms": latencies[int(len(latencies) * 0.99) - 1] * 1000,
+    }
+
+
+async def main_async(args):
+    product_ids = setup_catalog()
+    results = []
+    for use_queue in (False, True):
+        results.append(await run_mode(use_queue, product_ids, args.clients, args.orders))
+    print(f"{args.orders} orders, {args.clients} concurrent clients")
+    for r in results:
+        print(f"  {r['mode']:<20} {r['orders_per_sec']:8.1f} orders/s  p50 {r['p50_ms']:7.1f} ms  p99 {r['p99_ms']:7.1f} ms  errors {r['errors']}")
+    print(f"  speedup: {results[1]['orders_per_sec'] / results[0]['orders_per_sec']:.1f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--clients", type=int, default=50)
+    parser.add_argument("--orders", type=int, default=2000)
+    asyncio.run(main_async(parser.parse_args()))
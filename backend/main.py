@@ -3,16 +3,46 @@
 from fastapi import FastAPI
 
 from fastapi.middleware.cors import CORSMiddleware
-from database import engine
+from database import engine, SessionLocal, add_missing_columns
 from models import Base
 from api import router as api_router
 from contextlib import asynccontextmanager
+import asyncio
+import stock
+import shards
+import jobs
+import orders
+import coalesce
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Create all tables if they don't exist
     Base.metadata.create_all(bind=engine)
+    add_missing_columns(engine)
+    # Backfill the stock ledger from existing batches on first start
+    db = SessionLocal()
+    try:
+        stock.ensure_ledger(db)
+    finally:
+        db.close()
+    for retailer_id in shards.shard_ids():
+        db = shards.shard_session(retailer_id)
+        try:
+            stock.sync_batch_quantities(db)
+        finally:
+            db.close()
+    # Repricing and end-of-day jobs run in the background (disable with SHELFSMART_SCHEDULER=0)
+    scheduler = asyncio.create_task(jobs.run_scheduler()) if jobs.SCHEDULER_ENABLED else None
+    # Optional group-commit order writer (enable with SHELFSMART_ORDER_QUEUE=1)
+    if orders.QUEUE_ENABLED:
+        orders.order_queue = orders.OrderWriteQueue()
+        orders.order_queue.start()
     yield
+    if orders.order_queue:
+        await orders.order_queue.stop()
+        orders.order_queue = None
+    if scheduler:
+        scheduler.cancel()
 
 
 app = FastAPI(lifespan=lifespan)
@@ -37,3 +67,7 @@ app.add_middleware(
 def read_root():
     return {"message": "FastAPI is running with SQLite!"}
 
+@app.get("/stats/coalescing")
+def read_coalescing_stats():
+    """Executed vs. coalesced vs. micro-cached GET requests on the API router"""
+    return coalesce.stats
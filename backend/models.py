@@ -1,5 +1,5 @@
 
-from sqlalchemy import Column, Integer, String, Float, Date, DateTime, ForeignKey, func
+from sqlalchemy import Column, Integer, String, Float, Date, DateTime, ForeignKey, UniqueConstraint, func
 from sqlalchemy.orm import relationship
 from database import Base
 
@@ -21,11 +21,15 @@ class Product(Base):
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String, index=True, nullable=False)
     category = Column(String, index=True, nullable=True)
+    # Owning retailer (a RETAILER user); decides which shard holds the product's batches
+    retailer_id = Column(Integer, ForeignKey("users.id"), nullable=True, index=True)
     # Relationships
     batches = relationship("ProductBatch", back_populates="product")
 
 class ProductBatch(Base):
     __tablename__ = "product_batches"
+    # AUTOINCREMENT on per-retailer tables lets each shard start its ids at its own offset (see shards.py)
+    __table_args__ = {"sqlite_autoincrement": True}
 
     id = Column(Integer, primary_key=True, index=True)
     product_id = Column(Integer, ForeignKey("products.id"), nullable=False)
@@ -40,6 +44,7 @@ class ProductBatch(Base):
 
 class ProductPrice(Base):
     __tablename__ = "product_prices"
+    __table_args__ = {"sqlite_autoincrement": True}
 
     id = Column(Integer, primary_key=True, index=True)
     product_batch_id = Column(Integer, ForeignKey("product_batches.id"), nullable=False)
@@ -51,6 +56,7 @@ class ProductPrice(Base):
 # Inventory snapshot per product per day
 class Inventory(Base):
     __tablename__ = "inventories"
+    __table_args__ = {"sqlite_autoincrement": True}
     id = Column(Integer, primary_key=True, index=True)
     product_id = Column(Integer, ForeignKey("products.id"), nullable=False)
     date = Column(Date, nullable=False, index=True)
@@ -60,13 +66,17 @@ class Inventory(Base):
 # Order (sales transaction)
 class Order(Base):
     __tablename__ = "orders"
+    __table_args__ = {"sqlite_autoincrement": True}
     id = Column(Integer, primary_key=True, index=True)
     date = Column(Date, nullable=False)
     total_price = Column(Float, nullable=False)
+    # Shared by the per-retailer orders one cart was split into (sharded mode)
+    cart_id = Column(String, nullable=True, index=True)
     items = relationship("OrderItem", back_populates="order")
 
 class OrderItem(Base):
     __tablename__ = "order_items"
+    __table_args__ = {"sqlite_autoincrement": True}
     id = Column(Integer, primary_key=True, index=True)
     order_id = Column(Integer, ForeignKey("orders.id"), nullable=False)
     product_id = Column(Integer, ForeignKey("products.id"), nullable=False)
@@ -74,3 +84,71 @@ class OrderItem(Base):
     price = Column(Float, nullable=False)  # price per unit at time of order
     order = relationship("Order", back_populates="items")
     product = relationship("Product")
+
+# Append-only stock ledger: one row per receipt, sale or spoilage (quantity is a signed delta)
+class StockMovement(Base):
+    __tablename__ = "stock_movements"
+    __table_args__ = {"sqlite_autoincrement": True}
+    id = Column(Integer, primary_key=True, index=True)
+    product_id = Column(Integer, ForeignKey("products.id"), nullable=False, index=True)
+    product_batch_id = Column(Integer, ForeignKey("product_batches.id"), nullable=False, index=True)
+    kind = Column(String, nullable=False)  # RECEIPT, SALE or SPOILAGE
+    quantity = Column(Integer, nullable=False)
+    date = Column(Date, nullable=False, index=True)
+    order_id = Column(Integer, ForeignKey("orders.id"), nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+# Running stock balance per product, kept in step with the ledger
+class ProductStock(Base):
+    __tablename__ = "product_stock"
+    product_id = Column(Integer, ForeignKey("products.id"), primary_key=True)
+    quantity = Column(Integer, nullable=False, default=0)
+
+# Running stock balance per batch, kept in step with the ledger
+class BatchStock(Base):
+    __tablename__ = "batch_stock"
+    product_batch_id = Column(Integer, ForeignKey("product_batches.id"), primary_key=True)
+    product_id = Column(Integer, ForeignKey("products.id"), nullable=False, index=True)
+    quantity = Column(Integer, nullable=False, default=0)
+
+# Daily price summary per product, filled in as product_prices rows are archived
+class PriceRollup(Base):
+    __tablename__ = "price_rollups"
+    product_id = Column(Integer, ForeignKey("products.id"), primary_key=True)
+    date = Column(Date, primary_key=True)
+    min_price = Column(Float, nullable=False)
+    max_price = Column(Float, nullable=False)
+    price_sum = Column(Float, nullable=False)
+    price_count = Column(Integer, nullable=False)
+
+    @property
+    def avg_price(self):
+        return round(self.price_sum / self.price_count, 2) if self.price_count else 0.0
+
+# Daily sales summary per product, filled in as orders are archived
+class SalesRollup(Base):
+    __tablename__ = "sales_rollups"
+    product_id = Column(Integer, ForeignKey("products.id"), primary_key=True)
+    date = Column(Date, primary_key=True)
+    quantity = Column(Integer, nullable=False)
+    revenue = Column(Float, nullable=False)
+    order_count = Column(Integer, nullable=False)
+
+# One row per scheduled job per run date; `cursor` is the checkpoint a rerun resumes from
+class JobRun(Base):
+    __tablename__ = "job_runs"
+    __table_args__ = (UniqueConstraint("name", "run_date"), {"sqlite_autoincrement": True})
+    id = Column(Integer, primary_key=True, index=True)
+    name = Column(String, nullable=False)
+    run_date = Column(Date, nullable=False)
+    status = Column(String, nullable=False)  # PENDING, RUNNING, DONE or FAILED
+    cursor = Column(Integer, nullable=False, default=0)
+    rows_processed = Column(Integer, nullable=False, default=0)
+    duration_ms = Column(Float, nullable=False, default=0.0)
+    error = Column(String, nullable=True)
+    started_at = Column(DateTime(timezone=True), nullable=True)
+    finished_at = Column(DateTime(timezone=True), nullable=True)
+    # Refreshed by the runner holding the run; a RUNNING run with a stale heartbeat may be taken over
+    heartbeat = Column(DateTime(timezone=True), nullable=True)
+    # Times the run has been claimed; the scheduler backs off and gives up on repeated failures
+    attempts = Column(Integer, nullable=True, default=0)
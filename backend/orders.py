@@ -0,0 +1,222 @@
+import asyncio
+import os
+import uuid
+from typing import Dict, List, Optional
+from fastapi import HTTPException
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+from shards import SessionLocal, RoutedSession
+import models, schemas, stock
+
+# Order placement.
+#
+# `place_order` is the single write path for an order. By default the API calls
+# it once per request; with SHELFSMART_ORDER_QUEUE=1 requests are instead put on
+# a bounded queue and one writer task commits many orders per transaction
+# (group commit), so concurrent checkouts stop fighting over SQLite's write lock.
+
+QUEUE_ENABLED = os.environ.get("SHELFSMART_ORDER_QUEUE", "0") == "1"
+# Maximum orders waiting to be written; further requests get a 503
+QUEUE_DEPTH = int(os.environ.get("SHELFSMART_ORDER_QUEUE_DEPTH", "1000"))
+# How long the writer waits for more orders before committing a batch
+FLUSH_INTERVAL_MS = float(os.environ.get("SHELFSMART_ORDER_FLUSH_MS", "5"))
+MAX_BATCH = int(os.environ.get("SHELFSMART_ORDER_MAX_BATCH", "200"))
+# How long shutdown waits for queued orders to be written
+STOP_TIMEOUT_SECONDS = 10
+
+
+def place_order(db: Session, order: schemas.OrderCreate, cart_id: Optional[str] = None) -> models.Order:
+    """Add an order, its items and the matching stock movements (caller commits)"""
+    db_order = models.Order(date=order.date, total_price=order.total_price, cart_id=cart_id)
+    db.add(db_order)
+    db.flush()
+
+    for item in order.items:
+        db.add(models.OrderItem(
+            order_id=db_order.id,
+            product_id=item.product_id,
+            quantity=item.quantity,
+            price=item.price
+        ))
+        # Deduct from the cheapest batches that still have stock
+        stock.sell(db, item.product_id, item.quantity, order.date, db_order.id)
+    return db_order
+
+
+def split_order(db: RoutedSession, order: schemas.OrderCreate) -> Dict[int, schemas.OrderCreate]:
+    """Split a cart into one order per retailer shard (a single entry unless sharding is on).
+
+    The client's total is divided in proportion to each part's item subtotal,
+    with the rounding remainder on the last part, so the parts add up to it exactly.
+    """
+    groups: Dict[int, list] = {}
+    for item in order.items:
+        groups.setdefault(db.retailer_of(item.product_id), []).append(item)
+    if len(groups) <= 1:
+        return {retailer_id: order for retailer_id in groups} or {0: order}
+    retailer_ids = sorted(groups)
+    subtotals = {r: sum(i.quantity * i.price for i in groups[r]) for r in retailer_ids}
+    cart_subtotal = sum(subtotals.values())
+    totals = {}
+    for retailer_id in retailer_ids[:-1]:
+        share = subtotals[retailer_id] / cart_subtotal if cart_subtotal else 1 / len(retailer_ids)
+        totals[retailer_id] = round(order.total_price * share, 2)
+    totals[retailer_ids[-1]] = round(order.total_price - sum(totals.values()), 2)
+    return {
+        retailer_id: schemas.OrderCreate(date=order.date, total_price=totals[retailer_id], items=groups[retailer_id])
+        for retailer_id in retailer_ids
+    }
+
+
+def _lock_shards(db: RoutedSession, retailer_ids):
+    # Take every write lock before writing anything, always in ascending shard
+    # order so two carts never hold one shard each while waiting for the other
+    for retailer_id in sorted(retailer_ids):
+        db.for_retailer(retailer_id).execute(text("BEGIN IMMEDIATE"))
+
+
+def _place_parts(db: RoutedSession, parts: Dict[int, schemas.OrderCreate]) -> List[models.Order]:
+    cart_id = uuid.uuid4().hex if len(parts) > 1 else None
+    return [place_order(db.for_retailer(retailer_id), part, cart_id) for retailer_id, part in sorted(parts.items())]
+
+
+def place_routed_order(db: RoutedSession, order: schemas.OrderCreate) -> List[models.Order]:
+    """Place an order on the shard(s) owning its products (caller commits with db.commit_all()).
+
+    Nothing is committed here, so any failure while placing rolls back every
+    part of a cart; see RoutedSession.commit_all for what the commit guarantees.
+    """
+    parts = split_order(db, order)
+    if len(parts) > 1:
+        _lock_shards(db, parts)
+    return _place_parts(db, parts)
+
+
+def write_orders(orders: List[schemas.OrderCreate]) -> list:
+    """Write a batch of orders, committing each shard involved once.
+
+    When an order fails, the whole batch is rolled back and replayed without
+    it, so a cart split over several shards is written to all of them or to
+    none. Returns, per input and in order, either the list of Order ids created
+    for it or the exception that failed it.
+    """
+    results: list = [None] * len(orders)
+    db = SessionLocal()
+    try:
+        plan = []
+        for index, order in enumerate(orders):
+            try:
+                plan.append((index, split_order(db, order)))
+            except Exception as exc:
+                results[index] = exc
+
+        while True:
+            pending = [(index, parts) for index, parts in plan if results[index] is None]
+            if not pending:
+                break
+            placed = {}
+            try:
+                _lock_shards(db, {retailer_id for _, parts in pending for retailer_id in parts})
+            except Exception as exc:
+                db.rollback_all()
+                for index, _ in pending:
+                    results[index] = exc
+                break
+            failed = None
+            for index, parts in pending:
+                try:
+                    placed[index] = [o.id for o in _place_parts(db, parts)]
+                except Exception as exc:
+                    failed = (index, exc)
+                    break
+            if failed:
+                db.rollback_all()
+                results[failed[0]] = failed[1]
+                continue
+            try:
+                db.commit_all()
+            except Exception as exc:
+                db.rollback_all()
+                placed = {index: exc for index in placed}
+            for index, outcome in placed.items():
+                results[index] = outcome
+            break
+    except Exception as exc:
+        return [exc] * len(orders)
+    finally:
+        db.close()
+    return results
+
+
+class OrderWriteQueue:
+    def __init__(self, maxsize: int = QUEUE_DEPTH, flush_interval_ms: float = FLUSH_INTERVAL_MS, max_batch: int = MAX_BATCH):
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=maxsize)
+        self.flush_interval = flush_interval_ms / 1000
+        self.max_batch = max_batch
+        self.batches_written = 0
+        self.orders_written = 0
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self, timeout: float = STOP_TIMEOUT_SECONDS):
+        # Let queued orders finish, but never wait on a writer that has died or is stuck
+        if self._task and not self._task.done():
+            try:
+                await asyncio.wait_for(self.queue.join(), timeout)
+            except asyncio.TimeoutError:
+                print(f"Order queue: {self.queue.qsize()} orders not written after {timeout} s, giving up")
+        if self._task:
+            self._task.cancel()
+        # Anything still queued is failed rather than left waiting forever
+        while not self.queue.empty():
+            _, future = self.queue.get_nowait()
+            if not future.done():
+                future.set_exception(HTTPException(status_code=503, detail="Server is shutting down"))
+            self.queue.task_done()
+
+    async def submit(self, order: schemas.OrderCreate) -> List[int]:
+        """Queue an order and wait until it is committed. Returns the Order id(s) (one per shard)."""
+        if self._task is None or self._task.done():
+            raise HTTPException(status_code=503, detail="Order writer is not running")
+        future = asyncio.get_running_loop().create_future()
+        try:
+            self.queue.put_nowait((order, future))
+        except asyncio.QueueFull:
+            raise HTTPException(status_code=503, detail="Order queue is full, try again shortly")
+        return await future
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self.queue.get()]
+            deadline = loop.time() + self.flush_interval
+            while len(batch) < self.max_batch:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self.queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+
+            try:
+                results = await asyncio.to_thread(write_orders, [order for order, _ in batch])
+            except Exception as exc:
+                results = [exc] * len(batch)
+            for (_, future), result in zip(batch, results):
+                if future.done():
+                    continue
+                if isinstance(result, Exception):
+                    future.set_exception(result)
+                else:
+                    future.set_result(result)
+            self.batches_written += 1
+            self.orders_written += len(batch)
+            for _ in batch:
+                self.queue.task_done()
+
+
+# Created by the app lifespan when QUEUE_ENABLED is set
+order_queue: Optional[OrderWriteQueue] = None
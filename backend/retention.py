@@ -0,0 +1,226 @@
+import csv
+import gzip
+import os
+from datetime import date, timedelta
+from typing import List, Optional
+from sqlalchemy import delete
+from sqlalchemy.orm import Session
+from database import engine
+import shards
+from models import ProductBatch, ProductPrice, Order, OrderItem, PriceRollup, SalesRollup
+
+# Retention: move old product_prices and orders out of the live database into
+# gzipped CSV files under ARCHIVE_DIR, keeping daily rollups behind so history
+# charts and forecasts still have data. Price rollups are per product, not per
+# batch: the price chart falls back to them (/rollups/prices/) once a batch's
+# own rows are gone.
+#
+# Rows are moved oldest-id-first in chunks. Each chunk is written to its own
+# `<first id>-<last id>.csv.gz.pending` file, then rolled up and deleted in one
+# short transaction, and only renamed to its final name once that commits. An
+# interrupted run resumes from whatever is still in the live tables; the next
+# run first settles the .pending files left in its shard (see _settle_pending),
+# so a chunk that never committed cannot sit in the archive next to the file
+# that later holds the same rows under different boundaries.
+
+# Retention deletes live rows, so the scheduler and POST /jobs/retention/run
+# only run it when opted in; `python retention.py` always works
+RETENTION_ENABLED = os.environ.get("SHELFSMART_RETENTION", "0") == "1"
+ARCHIVE_DIR = os.environ.get("SHELFSMART_ARCHIVE_DIR", "./archive")
+# Price rows are archived once their batch has been expired this many days
+PRICE_RETENTION_DAYS = int(os.environ.get("SHELFSMART_PRICE_RETENTION_DAYS", "30"))
+# Orders older than this many days are archived
+ORDER_RETENTION_DAYS = int(os.environ.get("SHELFSMART_ORDER_RETENTION_DAYS", "365"))
+CHUNK_SIZE = 500
+
+ANALYZE_TABLES = ["product_prices", "orders", "order_items", "price_rollups", "sales_rollups"]
+
+
+PENDING = ".pending"
+
+
+def _write_chunk(table: str, columns: list, rows: list, first_id: int, last_id: int) -> str:
+    """Write a chunk under its .pending name; returns that path for _publish after the commit"""
+    folder = os.path.join(ARCHIVE_DIR, table)
+    os.makedirs(folder, exist_ok=True)
+    path = os.path.join(folder, f"{first_id:010d}-{last_id:010d}.csv.gz{PENDING}")
+    with open(path, "wb") as raw:
+        with gzip.open(raw, "wt", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(columns)
+            writer.writerows(rows)
+        raw.flush()
+        os.fsync(raw.fileno())
+    return path
+
+
+def _publish(*paths: str):
+    for path in paths:
+        os.replace(path, path[:-len(PENDING)])
+
+
+def _settle_pending(db: Session, model, tables: List[str]):
+    """Publish or drop the .pending files an interrupted run left for this shard.
+
+    A chunk's rows are deleted in one transaction, so if its first row is gone
+    the chunk committed and its files are published; otherwise they are dropped
+    and the rows get archived again. Other shards' files are left alone, since
+    their runs may still be in progress.
+    """
+    shard = shards.shard_of(db)
+    for table in tables:
+        folder = os.path.join(ARCHIVE_DIR, table)
+        if not os.path.isdir(folder):
+            continue
+        for name in sorted(os.listdir(folder)):
+            if not name.endswith(PENDING):
+                continue
+            first_id = int(name.split("-")[0])
+            if first_id // shards.SHARD_ID_SPAN != shard:
+                continue
+            path = os.path.join(folder, name)
+            if db.get(model, first_id) is None:
+                _publish(path)
+            else:
+                os.remove(path)
+
+
+def archive_prices(db: Session, as_of: date, chunk_size: int = CHUNK_SIZE) -> int:
+    """Archive price rows of batches that expired more than PRICE_RETENTION_DAYS before `as_of`"""
+    cutoff = as_of - timedelta(days=PRICE_RETENTION_DAYS)
+    _settle_pending(db, ProductPrice, ["product_prices"])
+    moved = 0
+    while True:
+        rows = db.query(
+            ProductPrice.id,
+            ProductPrice.product_batch_id,
+            ProductPrice.date,
+            ProductPrice.discounted_price,
+            ProductBatch.product_id,
+        ).join(
+            ProductBatch, ProductPrice.product_batch_id == ProductBatch.id
+        ).filter(ProductBatch.expiry_date < cutoff).order_by(ProductPrice.id).limit(chunk_size).all()
+        if not rows:
+            break
+
+        pending = _write_chunk(
+            "product_prices",
+            ["id", "product_batch_id", "date", "discounted_price"],
+            [row[:4] for row in rows],
+            rows[0].id,
+            rows[-1].id,
+        )
+
+        summary = {}
+        for row in rows:
+            key = (row.product_id, row.date)
+            lo, hi, total, count = summary.get(key, (row.discounted_price, row.discounted_price, 0.0, 0))
+            summary[key] = (min(lo, row.discounted_price), max(hi, row.discounted_price), total + row.discounted_price, count + 1)
+        for (product_id, day), (lo, hi, total, count) in summary.items():
+            rollup = db.get(PriceRollup, (product_id, day))
+            if rollup:
+                rollup.min_price = min(rollup.min_price, lo)
+                rollup.max_price = max(rollup.max_price, hi)
+                rollup.price_sum += total
+                rollup.price_count += count
+            else:
+                db.add(PriceRollup(product_id=product_id, date=day, min_price=lo, max_price=hi, price_sum=total, price_count=count))
+
+        db.execute(delete(ProductPrice).where(ProductPrice.id.in_([row.id for row in rows])))
+        db.commit()
+        _publish(pending)
+        moved += len(rows)
+    return moved
+
+
+def archive_orders(db: Session, as_of: date, chunk_size: int = CHUNK_SIZE) -> int:
+    """Archive orders (and their items) dated more than ORDER_RETENTION_DAYS before `as_of`"""
+    cutoff = as_of - timedelta(days=ORDER_RETENTION_DAYS)
+    _settle_pending(db, Order, ["orders", "order_items"])
+    moved = 0
+    while True:
+        orders = db.query(Order.id, Order.date, Order.total_price).filter(
+            Order.date < cutoff
+        ).order_by(Order.id).limit(chunk_size).all()
+        if not orders:
+            break
+        order_ids = [o.id for o in orders]
+        order_dates = {o.id: o.date for o in orders}
+        items = db.query(
+            OrderItem.id, OrderItem.order_id, OrderItem.product_id, OrderItem.quantity, OrderItem.price
+        ).filter(OrderItem.order_id.in_(order_ids)).order_by(OrderItem.id).all()
+
+        pending = [
+            _write_chunk("orders", ["id", "date", "total_price"], orders, order_ids[0], order_ids[-1]),
+            _write_chunk("order_items", ["id", "order_id", "product_id", "quantity", "price"], items, order_ids[0], order_ids[-1]),
+        ]
+
+        summary = {}
+        for item in items:
+            key = (item.product_id, order_dates[item.order_id])
+            quantity, revenue, order_set = summary.get(key, (0, 0.0, set()))
+            order_set.add(item.order_id)
+            summary[key] = (quantity + item.quantity, revenue + item.quantity * item.price, order_set)
+        for (product_id, day), (quantity, revenue, order_set) in summary.items():
+            rollup = db.get(SalesRollup, (product_id, day))
+            if rollup:
+                rollup.quantity += quantity
+                rollup.revenue += revenue
+                rollup.order_count += len(order_set)
+            else:
+                db.add(SalesRollup(product_id=product_id, date=day, quantity=quantity, revenue=revenue, order_count=len(order_set)))
+
+        db.execute(delete(OrderItem).where(OrderItem.order_id.in_(order_ids)))
+        db.execute(delete(Order).where(Order.id.in_(order_ids)))
+        db.commit()
+        _publish(*pending)
+        moved += len(orders)
+    return moved
+
+
+def compact(pages: int = 1000, convert: bool = False, bind=engine):
+    """Reclaim up to `pages` free pages and refresh planner statistics.
+
+    Only databases in incremental auto-vacuum mode give space back. Files created
+    before that mode was enabled (including the shipped shelfsmart.db) need one
+    full VACUUM to switch, which only happens when `convert` is set
+    (`python retention.py --convert`); until then archived rows leave free
+    pages that SQLite reuses but the file does not shrink.
+    """
+    with bind.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        mode = conn.exec_driver_sql("PRAGMA auto_vacuum").scalar()
+        if mode == 2:
+            conn.exec_driver_sql(f"PRAGMA incremental_vacuum({int(pages)})")
+        elif convert:
+            conn.exec_driver_sql("PRAGMA auto_vacuum = INCREMENTAL")
+            conn.exec_driver_sql("VACUUM")
+        else:
+            print(f"{bind.url.database}: auto_vacuum is off, no space reclaimed; run `python retention.py --convert` once")
+        # Sample-based ANALYZE keeps this cheap on large tables
+        conn.exec_driver_sql("PRAGMA analysis_limit = 1000")
+        for table in ANALYZE_TABLES:
+            conn.exec_driver_sql(f"ANALYZE {table}")
+
+
+def run_retention(as_of: Optional[date] = None, chunk_size: int = CHUNK_SIZE, convert: bool = False) -> dict:
+    as_of = as_of or date.today()
+    prices = orders = 0
+    for retailer_id in shards.shard_ids():
+        db = shards.shard_session(retailer_id)
+        try:
+            prices += archive_prices(db, as_of, chunk_size)
+            orders += archive_orders(db, as_of, chunk_size)
+            bind = db.get_bind()
+        finally:
+            db.close()
+        compact(convert=convert, bind=bind)
+    return {"product_prices": prices, "orders": orders}
+
+
+if __name__ == "__main__":
+    import sys
+    from models import Base
+    # Standalone runs may start before the API has ever created the rollup tables
+    Base.metadata.create_all(bind=engine)
+    result = run_retention(convert="--convert" in sys.argv)
+    print(f"Archived {result['product_prices']} price rows and {result['orders']} orders to {ARCHIVE_DIR}")
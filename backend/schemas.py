@@ -26,6 +26,7 @@ class User(UserBase):
 class ProductBase(BaseModel):
     name: str
     category: Optional[str] = None
+    retailer_id: Optional[int] = None
 
 class ProductCreate(ProductBase):
     pass
@@ -79,6 +80,40 @@ class Inventory(InventoryBase):
     class Config:
         orm_mode = True
 
+# Stock balances
+class ProductStock(BaseModel):
+    product_id: int
+    quantity: int
+    class Config:
+        orm_mode = True
+
+class BatchStock(BaseModel):
+    product_batch_id: int
+    product_id: int
+    quantity: int
+    class Config:
+        orm_mode = True
+
+# Daily rollups of archived prices and sales
+class PriceRollup(BaseModel):
+    product_id: int
+    date: date
+    min_price: float
+    max_price: float
+    avg_price: float
+    price_count: int
+    class Config:
+        orm_mode = True
+
+class SalesRollup(BaseModel):
+    product_id: int
+    date: date
+    quantity: int
+    revenue: float
+    order_count: int
+    class Config:
+        orm_mode = True
+
 # Order and OrderItem
 class OrderItemBase(BaseModel):
     product_id: int
@@ -103,6 +138,11 @@ class OrderCreate(OrderBase):
 class Order(OrderBase):
     id: int
     items: List[OrderItem]
+    # A cart spanning several retailer shards becomes one order per shard, all
+    # with the same cart_id; each lists the others and the whole cart's total
+    cart_id: Optional[str] = None
+    related_order_ids: List[int] = []
+    cart_total_price: Optional[float] = None
     class Config:
         orm_mode = True
 
@@ -120,3 +160,21 @@ class ProductPrice(ProductPriceBase):
     id: int
     class Config:
         orm_mode = True
+
+
+# Scheduled job runs
+class JobRun(BaseModel):
+    id: int
+    name: str
+    run_date: date
+    status: str
+    cursor: int
+    rows_processed: int
+    duration_ms: float
+    error: Optional[str] = None
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    heartbeat: Optional[datetime] = None
+    attempts: Optional[int] = None
+    class Config:
+        orm_mode = True
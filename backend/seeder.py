@@ -1,7 +1,8 @@
 import random
 from datetime import date, timedelta
 from sqlalchemy.orm import Session
-from models import Product, ProductBatch, ProductPrice, Inventory, Order, OrderItem
+from models import Product, ProductBatch, ProductPrice, Order, OrderItem
+import stock
 
 PRODUCT_NAMES = [
     "Tomato", "Potato", "Carrot", "Lettuce", "Cucumber", "Onion", "Pepper", "Broccoli", "Spinach", "Zucchini",
@@ -34,6 +35,20 @@ def next_day_price(prev_price, min_price, max_price):
     new_price = max(min_price, min(max_price, new_price))
     return round(new_price, 2)
 
+# Tiered markdown as a batch approaches expiry (never below 30% of base price)
+def get_discounted_price(base_price, days_to_expiry):
+    if days_to_expiry > 7:
+        factor = 1.0
+    elif days_to_expiry > 3:
+        factor = 0.85
+    elif days_to_expiry > 1:
+        factor = 0.7
+    elif days_to_expiry >= 0:
+        factor = 0.5
+    else:
+        factor = 0.3
+    return round(base_price * factor, 2)
+
 def seed_data(db: Session, days: int = 7):
 
     # 1. Products (with categories)
@@ -86,6 +101,8 @@ def seed_data(db: Session, days: int = 7):
     db.commit()
     for batch in batches:
         db.refresh(batch)
+        stock.receive_batch(db, batch)
+    db.commit()
 
     # 3. Product Prices (simulate for N days per batch)
     for batch in batches:
@@ -130,22 +147,15 @@ def seed_data(db: Session, days: int = 7):
             db.refresh(db_order)
             for pid, qty, price, batch in order_items:
                 db.add(OrderItem(order_id=db_order.id, product_id=pid, quantity=qty, price=price))
-                # Subtract from batch quantity
-                batch.quantity -= qty
+                # Subtract from batch quantity through the stock ledger
+                stock.record_sale(db, batch, qty, order_date, db_order.id)
             db.commit()
 
-    # 5. Inventory snapshot per product per day
+    # 5. Spoil expired batches, then rebuild one inventory snapshot per day from the ledger
+    stock.expire_batches(db, today)
     for d in range(days):
         snap_date = today - timedelta(days=days-d-1)
-        for product in products:
-            # Sum all batch quantities up to this day
-            batch_qty = db.query(ProductBatch).filter(ProductBatch.product_id == product.id, ProductBatch.manufacture_date <= snap_date).with_entities(ProductBatch.quantity).all()
-            total_batch_qty = sum(q[0] for q in batch_qty)
-            # Sum all order items (sales) up to and including this day
-            sold = db.query(OrderItem, Order).join(Order, OrderItem.order_id == Order.id).filter(OrderItem.product_id == product.id, Order.date <= snap_date).with_entities(OrderItem.quantity).all()
-            sold_qty = sum(q[0] for q in sold)
-            inventory_qty = total_batch_qty - sold_qty
-            db.add(Inventory(product_id=product.id, date=snap_date, quantity=inventory_qty))
+        stock.snapshot_inventory(db, snap_date, replay=True)
     db.commit()
 
 if __name__ == "__main__":
@@ -0,0 +1,202 @@
+import contextvars
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional
+from sqlalchemy import text
+from sqlalchemy.orm import Session, sessionmaker
+from database import Base, engine, make_engine, add_missing_columns
+
+# Per-retailer data partitioning.
+#
+# With SHELFSMART_SHARDING=1 the catalog (users, products) stays in the main
+# database while each retailer's batches, prices, inventory, stock ledger and
+# orders live in SHARD_DIR/retailer_<id>.db, so writes for different retailers
+# no longer share one SQLite lock. Products without an owner keep their data
+# in the main database ("shard 0").
+#
+# Row ids in a shard start at retailer_id * SHARD_ID_SPAN, so any batch, price
+# or order id tells you which shard it lives in. A shard file is created the
+# first time one of its retailer's products needs it; looking a row up by id
+# never creates one.
+#
+# Endpoints reach shards through the RoutedSession yielded by get_db: it is the
+# catalog session, plus for_product / for_retailer / for_id to get the session
+# that owns a row and fan_out to run a read on every shard in parallel. With
+# sharding off all of these simply return the session itself.
+
+SHARDING_ENABLED = os.environ.get("SHELFSMART_SHARDING", "0") == "1"
+SHARD_DIR = os.environ.get("SHELFSMART_SHARD_DIR", "./shards")
+SHARD_ID_SPAN = 1_000_000_000
+# Shard ids must stay below JavaScript's Number.MAX_SAFE_INTEGER (2**53 - 1)
+MAX_RETAILER_ID = (2**53 - 1) // SHARD_ID_SPAN - 1
+CATALOG_TABLES = {"users", "products"}
+
+_engines = {0: engine}
+_engines_lock = threading.Lock()
+# product id -> owning retailer id (ownership never changes once set)
+_owners: Dict[int, int] = {}
+_executor = ThreadPoolExecutor(max_workers=16, thread_name_prefix="shard")
+
+
+def shard_tables():
+    return [t for t in Base.metadata.sorted_tables if t.name not in CATALOG_TABLES]
+
+
+def _init_shard(shard_engine, retailer_id: int):
+    Base.metadata.create_all(bind=shard_engine, tables=shard_tables())
+    add_missing_columns(shard_engine, shard_tables())
+    offset = retailer_id * SHARD_ID_SPAN
+    with shard_engine.begin() as conn:
+        for table in shard_tables():
+            if table.dialect_options["sqlite"]["autoincrement"]:
+                conn.execute(
+                    text("INSERT INTO sqlite_sequence (name, seq) SELECT :name, :seq "
+                         "WHERE NOT EXISTS (SELECT 1 FROM sqlite_sequence WHERE name = :name)"),
+                    {"name": table.name, "seq": offset},
+                )
+
+
+class ShardNotFound(LookupError):
+    """No shard exists for this retailer id (and it was not asked to create one)"""
+
+
+def _shard_path(retailer_id: int) -> str:
+    return os.path.join(SHARD_DIR, f"retailer_{retailer_id}.db")
+
+
+def shard_engine(retailer_id: Optional[int], create: bool = False):
+    """Engine for a retailer's shard.
+
+    Only callers that have checked the retailer owns a product (product / batch
+    creation, orders) pass create=True; ids taken from requests must never leave
+    new files behind, so anything else raises ShardNotFound for a missing shard.
+    """
+    if not SHARDING_ENABLED or not retailer_id:
+        return engine
+    with _engines_lock:
+        if retailer_id not in _engines:
+            if not 0 < retailer_id <= MAX_RETAILER_ID:
+                if create:
+                    raise ValueError(f"Retailer id {retailer_id} is outside 1..{MAX_RETAILER_ID}")
+                raise ShardNotFound(retailer_id)
+            if not create and not os.path.exists(_shard_path(retailer_id)):
+                raise ShardNotFound(retailer_id)
+            os.makedirs(SHARD_DIR, exist_ok=True)
+            new_engine = make_engine(f"sqlite:///{_shard_path(retailer_id)}")
+            _init_shard(new_engine, retailer_id)
+            _engines[retailer_id] = new_engine
+        return _engines[retailer_id]
+
+
+def shard_ids() -> List[int]:
+    """Shard 0 (the main database) plus every retailer shard on disk"""
+    ids = {0}
+    if SHARDING_ENABLED:
+        ids.update(_engines)
+        if os.path.isdir(SHARD_DIR):
+            for filename in os.listdir(SHARD_DIR):
+                if filename.startswith("retailer_") and filename.endswith(".db"):
+                    ids.add(int(filename[len("retailer_"):-len(".db")]))
+    return sorted(ids)
+
+
+def shard_of(session: Session) -> int:
+    """Retailer id of the shard a session is bound to (0 for the main database)"""
+    bind = session.get_bind()
+    for retailer_id, shard in list(_engines.items()):
+        if shard is bind:
+            return retailer_id
+    return 0
+
+
+def shard_session(retailer_id: Optional[int], create: bool = False) -> Session:
+    if not SHARDING_ENABLED or not retailer_id:
+        return SessionLocal()
+    return Session(bind=shard_engine(retailer_id, create), autoflush=False)
+
+
+class RoutedSession(Session):
+    """Catalog session that also hands out the shard session owning a row"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._shard_sessions: Dict[int, Session] = {}
+
+    def for_retailer(self, retailer_id: Optional[int], create: bool = True) -> Session:
+        """Session for a retailer's shard; the retailer id must come from a product's owner"""
+        if not SHARDING_ENABLED or not retailer_id:
+            return self
+        if retailer_id not in self._shard_sessions:
+            self._shard_sessions[retailer_id] = shard_session(retailer_id, create)
+        return self._shard_sessions[retailer_id]
+
+    def retailer_of(self, product_id: int) -> int:
+        if not SHARDING_ENABLED:
+            return 0
+        if product_id not in _owners:
+            from models import Product
+            row = self.query(Product.retailer_id).filter(Product.id == product_id).first()
+            if row is None:
+                return 0
+            _owners[product_id] = row.retailer_id or 0
+        return _owners[product_id]
+
+    def for_product(self, product_id: int) -> Session:
+        return self.for_retailer(self.retailer_of(product_id))
+
+    def for_id(self, row_id: int) -> Session:
+        """Session for the shard a batch / price / order id was allocated in.
+
+        Raises ShardNotFound when that shard does not exist, so the row cannot either.
+        """
+        return self.for_retailer(row_id // SHARD_ID_SPAN, create=False)
+
+    def fan_out(self, fn: Callable[[Session], list], product_id: Optional[int] = None) -> list:
+        """Run `fn` on the owning shard of `product_id`, or on every shard in parallel and merge"""
+        if product_id:
+            return list(fn(self.for_product(product_id)))
+        if not SHARDING_ENABLED:
+            return list(fn(self))
+
+        def run(retailer_id):
+            session = shard_session(retailer_id)
+            try:
+                return list(fn(session))
+            finally:
+                session.close()
+
+        # Each worker runs in a copy of the caller's context so contextvars (e.g. the
+        # load test's per-scenario query counter) follow the request into the pool
+        futures = [_executor.submit(contextvars.copy_context().run, run, retailer_id) for retailer_id in shard_ids()]
+        merged = []
+        for future in futures:
+            merged.extend(future.result())
+        return merged
+
+    def commit_all(self):
+        """Commit the catalog / shard 0 session, then each shard session in ascending order.
+
+        SQLite cannot commit several files atomically. Writers take every shard's
+        write lock before writing (see orders._lock_shards) and any error while
+        writing rolls back all shards, so only a crash or I/O error between two
+        of these commits can leave part of a cart committed. Its orders share a
+        cart_id, which is how such a cart is found and repaired.
+        """
+        self.commit()
+        for retailer_id in sorted(self._shard_sessions):
+            self._shard_sessions[retailer_id].commit()
+
+    def rollback_all(self):
+        for session in self._shard_sessions.values():
+            session.rollback()
+        self.rollback()
+
+    def close(self):
+        for session in self._shard_sessions.values():
+            session.close()
+        self._shard_sessions.clear()
+        super().close()
+
+
+SessionLocal = sessionmaker(class_=RoutedSession, autocommit=False, autoflush=False, bind=engine)
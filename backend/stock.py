@@ -0,0 +1,176 @@
+from datetime import date, timedelta
+from typing import Optional
+from sqlalchemy import Date, insert, update, delete, select, func, literal
+from sqlalchemy.orm import Session
+from models import ProductBatch, Inventory, StockMovement, ProductStock, BatchStock
+
+# Stock ledger.
+#
+# Every change to stock is appended to `stock_movements` as a signed delta and
+# applied to the `product_stock` / `batch_stock` running balances in the same
+# transaction, so current stock is a single primary-key lookup. Daily
+# `Inventory` rows are snapshots taken from the balances by `close_day`;
+# today's row is also kept equal to the balance on every movement, because
+# clients read the newest inventory row as current stock. Likewise
+# `product_batches.quantity` moves with every sale and spoilage, so it always
+# equals the batch's `batch_stock` balance.
+# None of these helpers commit; the caller owns the transaction.
+
+RECEIPT = "RECEIPT"
+SALE = "SALE"
+SPOILAGE = "SPOILAGE"
+
+
+def _apply(db: Session, product_id: int, batch_id: int, kind: str, delta: int, on_date: date, order_id: Optional[int] = None):
+    db.execute(insert(StockMovement).values(
+        product_id=product_id,
+        product_batch_id=batch_id,
+        kind=kind,
+        quantity=delta,
+        date=on_date,
+        order_id=order_id,
+    ))
+    updated = db.execute(
+        update(ProductStock)
+        .where(ProductStock.product_id == product_id)
+        .values(quantity=ProductStock.quantity + delta)
+    ).rowcount
+    if not updated:
+        db.execute(insert(ProductStock).values(product_id=product_id, quantity=delta))
+    updated = db.execute(
+        update(BatchStock)
+        .where(BatchStock.product_batch_id == batch_id)
+        .values(quantity=BatchStock.quantity + delta)
+    ).rowcount
+    if not updated:
+        db.execute(insert(BatchStock).values(product_batch_id=batch_id, product_id=product_id, quantity=delta))
+    if kind != RECEIPT:
+        # A receipt's quantity is the batch's own starting quantity
+        db.execute(
+            update(ProductBatch)
+            .where(ProductBatch.id == batch_id)
+            .values(quantity=ProductBatch.quantity + delta)
+        )
+    _sync_today_snapshot(db, product_id)
+
+
+def _sync_today_snapshot(db: Session, product_id: int):
+    today = date.today()
+    balance = select(ProductStock.quantity).where(ProductStock.product_id == product_id).scalar_subquery()
+    updated = db.execute(
+        update(Inventory)
+        .where(Inventory.product_id == product_id, Inventory.date == today)
+        .values(quantity=balance)
+    ).rowcount
+    if not updated:
+        db.execute(insert(Inventory).values(product_id=product_id, date=today, quantity=balance))
+
+
+def receive_batch(db: Session, batch: ProductBatch, on_date: Optional[date] = None):
+    """Record a newly created batch as a receipt (batch must already have an id)"""
+    _apply(db, batch.product_id, batch.id, RECEIPT, batch.quantity, on_date or batch.manufacture_date)
+
+
+def record_sale(db: Session, batch: ProductBatch, quantity: int, on_date: date, order_id: Optional[int] = None):
+    """Record a sale from a specific batch (which also deducts it from the batch quantity)"""
+    _apply(db, batch.product_id, batch.id, SALE, -quantity, on_date, order_id)
+
+
+def sell(db: Session, product_id: int, quantity: int, on_date: date, order_id: Optional[int] = None) -> int:
+    """Sell from the cheapest batches with stock left. Returns the quantity actually allocated."""
+    rows = db.query(ProductBatch, BatchStock.quantity).join(
+        BatchStock, BatchStock.product_batch_id == ProductBatch.id
+    ).filter(
+        ProductBatch.product_id == product_id,
+        BatchStock.quantity > 0,
+    ).order_by(ProductBatch.base_price.asc()).all()
+
+    remaining = quantity
+    for batch, available in rows:
+        if remaining <= 0:
+            break
+        deduct_amount = min(remaining, available)
+        record_sale(db, batch, deduct_amount, on_date, order_id)
+        remaining -= deduct_amount
+    return quantity - remaining
+
+
+def expire_batches(db: Session, as_of: date) -> int:
+    """Write off remaining stock of batches that expired before `as_of`. Returns units spoiled."""
+    rows = db.query(BatchStock).join(
+        ProductBatch, BatchStock.product_batch_id == ProductBatch.id
+    ).filter(
+        ProductBatch.expiry_date < as_of,
+        BatchStock.quantity > 0,
+    ).with_entities(BatchStock.product_id, BatchStock.product_batch_id, BatchStock.quantity, ProductBatch.expiry_date).all()
+
+    spoiled = 0
+    for product_id, batch_id, quantity, expiry_date in rows:
+        _apply(db, product_id, batch_id, SPOILAGE, -quantity, expiry_date)
+        spoiled += quantity
+    return spoiled
+
+
+def current_stock(db: Session, product_id: int) -> int:
+    balance = db.get(ProductStock, product_id)
+    return balance.quantity if balance else 0
+
+
+def snapshot_inventory(db: Session, snap_date: date, replay: bool = False):
+    """Replace the `Inventory` rows for `snap_date` in one bulk statement.
+
+    By default the snapshot copies the running balances (end-of-day job). With
+    `replay=True` it is rebuilt from ledger movements dated up to `snap_date`,
+    which is how past days are reconstructed.
+    """
+    if replay:
+        source = select(
+            StockMovement.product_id,
+            func.sum(StockMovement.quantity),
+        ).where(StockMovement.date <= snap_date).group_by(StockMovement.product_id)
+    else:
+        source = select(ProductStock.product_id, ProductStock.quantity)
+    db.execute(delete(Inventory).where(Inventory.date == snap_date))
+    db.execute(insert(Inventory).from_select(
+        ["product_id", "quantity", "date"],
+        source.add_columns(literal(snap_date, Date)),
+    ))
+
+
+def close_day(db: Session, day: date) -> int:
+    """End-of-day job: spoil batches expiring on or before `day`, then snapshot inventory.
+
+    A day closed late (a missed run being caught up) is snapshotted from the
+    ledger as of that day rather than from today's balances.
+    """
+    spoiled = expire_batches(db, day + timedelta(days=1))
+    snapshot_inventory(db, day, replay=day < date.today())
+    return spoiled
+
+
+def ensure_ledger(db: Session) -> int:
+    """Seed the ledger from existing batches the first time it is used. Returns batches backfilled."""
+    if db.query(StockMovement.id).first() is not None:
+        return 0
+    batches = db.query(ProductBatch).all()
+    for batch in batches:
+        receive_batch(db, batch)
+    db.commit()
+    return len(batches)
+
+
+def sync_batch_quantities(db: Session) -> int:
+    """Reset `product_batches.quantity` to the ledger balance where they disagree.
+
+    Spoilage used to leave the batch quantity untouched; this repairs batches
+    written off before that was fixed. Returns batches corrected.
+    """
+    balance = select(BatchStock.quantity).where(BatchStock.product_batch_id == ProductBatch.id).scalar_subquery()
+    corrected = db.execute(
+        update(ProductBatch)
+        .where(ProductBatch.id.in_(select(BatchStock.product_batch_id)), ProductBatch.quantity != balance)
+        .values(quantity=balance)
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    db.commit()
+    return corrected
@@ -0,0 +1,103 @@
+import importlib.util
+import json
+from datetime import date
+from typing import List, Optional
+from fastapi import HTTPException, Request, Response
+from sqlalchemy.orm import InstrumentedAttribute
+
+# Content negotiation for the large list endpoints.
+#
+# The endpoint selects only the requested columns (`fields=id,date,...`) and
+# hands back plain row tuples, which are encoded according to the Accept header:
+#
+#   application/json                       [{"id": 1, "date": "..."}, ...] (default)
+#   application/vnd.shelfsmart.columns+json {"id": [1, ...], "date": ["...", ...]}
+#   application/msgpack                    the column layout as MessagePack
+#
+# Rows skip ORM objects and pydantic validation entirely, which is where most of
+# the time went for tall results. The msgpack package is imported on first use;
+# without it clients asking for MessagePack get JSON.
+
+JSON = "application/json"
+COLUMNS_JSON = "application/vnd.shelfsmart.columns+json"
+MSGPACK = "application/msgpack"
+MEDIA_TYPES = [JSON, COLUMNS_JSON, MSGPACK, "application/x-msgpack"]
+
+# OpenAPI `responses=` entry advertising the alternative encodings
+RESPONSES = {200: {"content": {COLUMNS_JSON: {}, MSGPACK: {}}}}
+
+
+def _msgpack():
+    # negotiate() only picks MessagePack when the package is installed
+    import msgpack
+    return msgpack
+
+
+def _quality(params: List[str]) -> float:
+    for param in params:
+        name, _, value = param.partition("=")
+        if name.strip().lower() == "q":
+            try:
+                return float(value)
+            except ValueError:
+                return 0.0
+    return 1.0
+
+
+def negotiate(request: Request) -> str:
+    """Highest-q media type in the Accept header we can produce (earlier wins ties).
+
+    Anything else, including */*, a missing header or an unsupported type such
+    as text/plain, gets JSON, as before content negotiation existed.
+    """
+    candidates = []
+    for position, part in enumerate(request.headers.get("accept", "").split(",")):
+        media_type, *params = part.split(";")
+        media_type = media_type.strip().lower()
+        if media_type in ("*/*", "application/*"):
+            media_type = JSON
+        elif media_type == "application/x-msgpack":
+            media_type = MSGPACK
+        if media_type == MSGPACK and importlib.util.find_spec("msgpack") is None:
+            continue
+        quality = _quality(params)
+        if media_type in MEDIA_TYPES and quality > 0:
+            candidates.append((-quality, position, media_type))
+    return min(candidates)[2] if candidates else JSON
+
+
+def select_columns(model, schema, fields: Optional[str]) -> List[InstrumentedAttribute]:
+    """Model columns for `fields` (comma separated), or every schema field in schema order"""
+    available = list(getattr(schema, "model_fields", None) or schema.__fields__)
+    names = [name.strip() for name in fields.split(",") if name.strip()] if fields else available
+    unknown = [name for name in names if name not in available]
+    if unknown or not names:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unknown fields: {', '.join(unknown)}. Available: {', '.join(available)}",
+        )
+    return [getattr(model, name) for name in dict.fromkeys(names)]
+
+
+def _plain(column: list) -> list:
+    # Dates go out as ISO strings in every format, as in the row JSON
+    if any(isinstance(value, date) for value in column):
+        return [value.isoformat() if isinstance(value, date) else value for value in column]
+    return column
+
+
+def respond(media_type: str, columns: List[InstrumentedAttribute], rows: list) -> Response:
+    names = [column.key for column in columns]
+    data = [_plain(list(values)) for values in zip(*rows)] if rows else [[] for _ in names]
+
+    if media_type == JSON:
+        body = json.dumps(
+            [dict(zip(names, values)) for values in zip(*data)],
+            ensure_ascii=False, allow_nan=False, separators=(",", ":"),
+        )
+    elif media_type == COLUMNS_JSON:
+        body = json.dumps(dict(zip(names, data)), ensure_ascii=False, allow_nan=False, separators=(",", ":"))
+    else:
+        body = _msgpack().packb(dict(zip(names, data)))
+    # The body depends on Accept, so caches must key on it too
+    return Response(content=body, media_type=media_type, headers={"Vary": "Accept"})
@@ -1,14 +1,12 @@
-
 import sys
 from datetime import date, timedelta, datetime
 from sqlalchemy.orm import Session
-from database import SessionLocal
 from models import ProductBatch, ProductPrice
-from seeder import get_discounted_price, PRODUCT_PRICE_RANGES
+from seeder import get_discounted_price
 
-def parse_date_arg():
-    if len(sys.argv) > 1:
-        arg = sys.argv[1]
+def parse_date_arg(argv):
+    if len(argv) > 1:
+        arg = argv[1]
         # Accept YYYY-MM-DD or MM-DD
         try:
             if len(arg) == 5 and '-' in arg:
@@ -22,19 +20,36 @@ def parse_date_arg():
             sys.exit(1)
     return date.today() + timedelta(days=1)
 
-target_date = parse_date_arg()
 
+def update_prices_chunk(db: Session, target_date: date, after_id: int, limit: int):
+    """Price the next `limit` batches after `after_id` for `target_date`.
 
-def update_prices_for_date(db: Session, target_date: date):
-    batches = db.query(ProductBatch).all()
+    Existing prices for the date are overwritten rather than duplicated, so
+    rerunning a date is safe. Returns (last batch id or None when done, rows).
+    """
+    batches = db.query(ProductBatch).filter(ProductBatch.id > after_id).order_by(ProductBatch.id).limit(limit).all()
+    if not batches:
+        return None, 0
+    existing = {
+        p.product_batch_id: p
+        for p in db.query(ProductPrice).filter(
+            ProductPrice.product_batch_id.in_([b.id for b in batches]),
+            ProductPrice.date == target_date,
+        ).all()
+    }
     for batch in batches:
         # Use tiered discount logic
         days_to_expiry = (batch.expiry_date - target_date).days
         new_price = get_discounted_price(batch.base_price, days_to_expiry)
-        db.add(ProductPrice(product_batch_id=batch.id, date=target_date, discounted_price=new_price))
-    db.commit()
-    print(f"Updated prices for {len(batches)} batches for {target_date}")
+        if batch.id in existing:
+            existing[batch.id].discounted_price = new_price
+        else:
+            db.add(ProductPrice(product_batch_id=batch.id, date=target_date, discounted_price=new_price))
+    return batches[-1].id, len(batches)
 
 if __name__ == "__main__":
-    db = SessionLocal()
-    update_prices_for_date(db, target_date)
+    import jobs
+    jobs.create_tables()
+    target_date = parse_date_arg(sys.argv)
+    for retailer_id, run in jobs.run_job_all_shards("update_prices", target_date).items():
+        print(f"Updated prices for {run.rows_processed} batches for {target_date} (shard {retailer_id}): {run.status}")
@@ -1,8 +1,9 @@
 import { useEffect, useState } from "react";
 import api from "@/lib/api";
 
-export default function PriceHistoryGraph({ batchId }) {
+export default function PriceHistoryGraph({ batchId, productId, fromDate }) {
   const [prices, setPrices] = useState([]);
+  const [archived, setArchived] = useState(false);
   const [loading, setLoading] = useState(true);
   const [error, setError] = useState("");
 
@@ -10,9 +11,17 @@ export default function PriceHistoryGraph({ batchId }) {
     async function fetchPrices() {
       setLoading(true);
       setError("");
+      setArchived(false);
       try {
         const res = await api.get(`/api/v1/product-prices/?product_batch_id=${batchId}`);
-        setPrices(res.data);
+        if (res.data.length === 0 && productId) {
+          // Old batches' prices are archived; show the product's daily average since the batch was made instead
+          const rollups = await api.get(`/api/v1/rollups/prices/?product_id=${productId}&date_from=${fromDate}`);
+          setPrices(rollups.data.map(r => ({ date: r.date, discounted_price: r.avg_price })));
+          setArchived(rollups.data.length > 0);
+        } else {
+          setPrices(res.data);
+        }
       } catch (err) {
         setError("Failed to load price history.");
       } finally {
@@ -20,7 +29,7 @@ export default function PriceHistoryGraph({ batchId }) {
       }
     }
     if (batchId) fetchPrices();
-  }, [batchId]);
+  }, [batchId, productId, fromDate]);
 
   if (!batchId) return null;
   if (loading) return <div className="text-muted-foreground">Loading price history...</div>;
@@ -49,6 +58,7 @@ export default function PriceHistoryGraph({ batchId }) {
   return (
     <div className="mt-6">
       <h4 className="font-semibold mb-2 text-foreground">Price History</h4>
+      {archived && <div className="text-xs text-muted-foreground mb-2">Archived: daily average price for this product.</div>}
       <svg width={width} height={height} className="w-full">
         <polyline
           fill="none"
@@ -144,7 +144,11 @@ export default function ProductPage() {
             {/* Price history graph as a visually separated card beside the product card on desktop, below on mobile */}
             {selectedBatch && (
               <div className="w-full md:w-1/2 flex-shrink-0">
-                <PriceHistoryGraph batchId={selectedBatch.id} />
+                <PriceHistoryGraph
+                  batchId={selectedBatch.id}
+                  productId={selectedBatch.product_id}
+                  fromDate={selectedBatch.manufacture_date}
+                />
               </div>
             )}
           </div>